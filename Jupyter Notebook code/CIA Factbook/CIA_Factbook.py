@@ -6,13 +6,7 @@
 # In[7]:
 
 
-import sqlite3
-import pandas as pd 
-
-conn = sqlite3.connect('factbook.db')
-
-def run_query(query, conn = conn):
-    return pd.read_sql_query(query, conn)
+from factbook_cache import run_query
 
 query_1 = "SELECT * FROM sqlite_master WHERE type='table';"
 run_query(query_1)
@@ -74,7 +68,7 @@ from facts
 where population != (select max(population) from facts)
 and population != (select min(population) from facts);
 '''
-pd.read_sql_query(query_6, conn).hist(ax=ax)
+run_query(query_6).hist(ax=ax)
 
 
 # # Top 20 Highly Densed Countries
@@ -100,5 +94,5 @@ query_8 = '''
 select name, cast(population as float)/cast(area as float) density from facts order by density desc
 '''
 
-pd.read_sql_query(query_8, conn).hist(ax=ax_1)
+run_query(query_8).hist(ax=ax_1)
 
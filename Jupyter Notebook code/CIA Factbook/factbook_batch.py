@@ -0,0 +1,65 @@
+"""Run independent factbook report queries concurrently.
+
+`CIA_Factbook.py` runs `query_1` to `query_8` one after another although
+none of them depends on another. `run_batch` runs a dict of named queries
+in a thread pool, each on its own read-only connection. `sqlite3` releases
+the GIL while SQLite executes a statement, so the queries overlap and the
+batch takes about as long as its slowest query.
+
+    results, latencies, total = run_batch({'query_3': query_3, 'query_4': query_4})
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from factbook_db import DB_PATH, ConnectionPool
+from factbook_db import run_query as run_single
+
+MAX_WORKERS = 8
+
+
+def timed_query(pool, query, params=None, run_query=run_single):
+    """Run `query` on a connection of `pool`, returning the result and seconds."""
+    with pool.connection() as conn:
+        start = time.perf_counter()
+        result = run_query(query, conn=conn, params=params)
+        return result, time.perf_counter() - start
+
+
+def run_batch(queries, db=DB_PATH, params=None, max_workers=MAX_WORKERS, run_query=run_single):
+    """Run named queries concurrently and collect their results.
+
+    Args:
+        queries (dict): Maps names to SQL.
+        db (str): Database to run them on.
+        params (dict): Maps names to the parameters of their query, if any.
+        max_workers (int): Largest number of queries, and connections, in
+            flight at once.
+        run_query (function): Runs one query given `conn` and `params`, like
+            `factbook_db.run_query`.
+
+    Returns:
+        tuple: A dict of the results and a dict of the seconds each query
+        took, both keyed and ordered like `queries`, and the wall time of
+        the whole batch in seconds.
+
+    Raises:
+        Exception: The first error raised by a query, once all of them are
+            done.
+    """
+    params = params or {}
+    workers = max(1, min(max_workers, len(queries)))
+    pool = ConnectionPool(db, size=workers)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                name: executor.submit(timed_query, pool, query, params.get(name), run_query)
+                for name, query in queries.items()
+            }
+        results = {}
+        latencies = {}
+        for name, future in futures.items():
+            results[name], latencies[name] = future.result()
+    finally:
+        pool.close()
+    return results, latencies, time.perf_counter() - start
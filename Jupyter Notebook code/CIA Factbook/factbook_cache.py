@@ -0,0 +1,167 @@
+"""Result cache in front of `factbook_db.run_query`.
+
+The factbook reports rerun the same queries many times a day against data
+that rarely changes. `QueryCache` keeps their DataFrames keyed on the
+database, the whitespace-normalized SQL and the bound parameters, and
+evicts the least recently used ones once their total memory goes over a
+limit.
+
+Entries of a database are dropped as soon as it may have changed: a
+long-lived watcher connection per database reads `PRAGMA data_version`,
+which moves whenever any other connection or process commits, and the
+mtime and size of the file and its WAL are compared as well.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from factbook_db import DB_PATH, connect_read_only
+from factbook_db import run_query as run_uncached
+
+MAX_BYTES = 256 * 2 ** 20
+
+# quoted strings and identifiers are kept as they are, whitespace elsewhere collapses
+SQL_TOKENS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])|(\s+)""")
+
+
+def normalize_sql(query):
+    """Collapse runs of whitespace outside quotes and drop a trailing `;`."""
+    query = SQL_TOKENS.sub(lambda m: m.group(1) or ' ', query).strip()
+    return query.rstrip(';').rstrip()
+
+
+def params_key(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+
+def file_signature(path):
+    """mtime and size of the database file and of its WAL, if any."""
+    signature = []
+    for name in (path, path + '-wal'):
+        try:
+            stat = os.stat(name)
+        except FileNotFoundError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class QueryCache:
+    """LRU cache of query results, bounded by the memory of the DataFrames.
+
+    Args:
+        max_bytes (int): Evict old entries once the cached DataFrames take
+            more than this. Results bigger than this are never cached.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.watchers = {}
+        # bumped on every invalidation of a database, so results of queries
+        # that started before it are not stored
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def run_query(self, query, db=DB_PATH, params=None):
+        """Return the result of `query` from the cache, running it on a miss.
+
+        A copy of the cached DataFrame is returned, so callers can modify it
+        without corrupting the cache.
+        """
+        path = os.path.abspath(db)
+        key = (path, normalize_sql(query), params_key(params))
+        with self.lock:
+            self._validate(path)
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy()
+            self.misses += 1
+            generation = self.generations.get(path, 0)
+
+        result = run_uncached(query, db=db, params=params)
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        with self.lock:
+            # check again, in case a commit landed while the query ran: if
+            # another call already saw it, the generation moved on, and if
+            # none did yet, this validation catches it
+            self._validate(path)
+            stale = self.generations.get(path, 0) != generation
+            if not stale and size <= self.max_bytes and key not in self.entries:
+                self.entries[key] = (result.copy(), size)
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    old_key, (old, old_size) = self.entries.popitem(last=False)
+                    self.bytes -= old_size
+                    self.evictions += 1
+        return result
+
+    def _validate(self, path):
+        """Drop the entries of `path` if the database changed since last time."""
+        watcher = self.watchers.get(path)
+        if watcher is None:
+            conn = connect_read_only(path)
+            self.watchers[path] = [conn, self._version(conn), file_signature(path)]
+            return
+        conn, version, signature = watcher
+        new_version = self._version(conn)
+        new_signature = file_signature(path)
+        if new_version != version or new_signature != signature:
+            watcher[1:] = [new_version, new_signature]
+            self.invalidate(path)
+
+    @staticmethod
+    def _version(conn):
+        return conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def invalidate(self, path=None):
+        """Drop the cached results of one database, or of all of them."""
+        if path is not None:
+            path = os.path.abspath(path)
+        names = [path] if path is not None else set(self.watchers) | set(self.generations)
+        for name in names:
+            self.generations[name] = self.generations.get(name, 0) + 1
+        for key in [key for key in self.entries if path is None or key[0] == path]:
+            self.bytes -= self.entries.pop(key)[1]
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry and close the watcher connections."""
+        with self.lock:
+            self.invalidate()
+            for conn, version, signature in self.watchers.values():
+                conn.close()
+            self.watchers.clear()
+
+    def stats(self):
+        """Return the hit, miss and eviction counters and the cache size."""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+            }
+
+
+cache = QueryCache()
+
+
+def run_query(query, db=DB_PATH, params=None):
+    """`factbook_db.run_query` through the shared `cache`."""
+    return cache.run_query(query, db=db, params=params)
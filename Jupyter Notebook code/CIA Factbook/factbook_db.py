@@ -0,0 +1,158 @@
+"""Shared, thread-safe access to SQLite databases for the factbook reports.
+
+`CIA_Factbook.py` used to open a single `sqlite3.connect('factbook.db')` at
+import and bind it as the default argument of `run_query`, so every report
+serialized on one connection to one file. Here each database path gets its
+own `ConnectionPool` of read-only connections. Every connection keeps its
+own prepared-statement cache (`cached_statements`), so repeated report
+queries are compiled once per connection.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import pandas as pd
+
+DB_PATH = 'factbook.db'
+POOL_SIZE = 4
+CACHED_STATEMENTS = 256
+# handed to the threads waiting in `acquire` when the pool is closed
+_CLOSED = object()
+
+
+def connect_read_only(path, cached_statements=CACHED_STATEMENTS):
+    """Open `path` read-only, usable from any thread.
+
+    Raises:
+        sqlite3.OperationalError: If `path` does not exist.
+    """
+    uri = 'file:{}?mode=ro'.format(quote(os.path.abspath(path)))
+    return sqlite3.connect(
+        uri, uri=True, check_same_thread=False, cached_statements=cached_statements
+    )
+
+
+class ConnectionPool:
+    """Up to `size` read-only connections to one database, opened on demand.
+
+    Args:
+        path (str): Location of the SQLite file.
+        size (int): Maximum number of open connections.
+        cached_statements (int): Size of each connection's statement cache.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, cached_statements=CACHED_STATEMENTS):
+        self.path = path
+        self.size = size
+        self.cached_statements = cached_statements
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.waiting = 0
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take an idle connection, open a new one, or wait for one to free up."""
+        with self.lock:
+            if self.closed:
+                raise sqlite3.ProgrammingError('pool for {} is closed'.format(self.path))
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            if self.opened < self.size:
+                self.opened += 1
+                try:
+                    return connect_read_only(self.path, self.cached_statements)
+                except Exception:
+                    self.opened -= 1
+                    raise
+            self.waiting += 1
+        try:
+            conn = self.idle.get()
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        if conn is _CLOSED:
+            raise sqlite3.ProgrammingError('pool for {} is closed'.format(self.path))
+        return conn
+
+    def release(self, conn):
+        with self.lock:
+            if self.closed:
+                conn.close()
+                self.opened -= 1
+                return
+            self.idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a `with` block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close the idle connections now and the borrowed ones when returned.
+
+        Threads waiting for a connection get `sqlite3.ProgrammingError`.
+        """
+        with self.lock:
+            self.closed = True
+            while True:
+                try:
+                    self.idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self.opened -= 1
+            for _ in range(self.waiting):
+                self.idle.put(_CLOSED)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path=DB_PATH):
+    """Return the shared pool for `path`, creating it on first use."""
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = ConnectionPool(path)
+        return pool
+
+
+def close_all():
+    """Close the pools of every database opened through `get_pool`."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+atexit.register(close_all)
+
+
+def run_query(query, conn=None, db=DB_PATH, params=None):
+    """Run `query` and return the result as a DataFrame.
+
+    Args:
+        query (str): SQL to run.
+        conn (sqlite3.Connection): Connection to use instead of the pool.
+        db (str): Database file whose pool serves the query.
+        params (tuple or dict): Parameters bound to the query.
+
+    Returns:
+        pandas DataFrame: The rows returned by the query.
+    """
+    if conn is not None:
+        return pd.read_sql_query(query, conn, params=params)
+    with get_pool(db).connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
@@ -0,0 +1,127 @@
+"""Histograms of SQL result sets without loading them into a DataFrame.
+
+`pd.read_sql_query(query_6, conn).hist(ax=ax)` materializes the whole result
+before binning it. `sql_histograms` pulls the rows with `fetchmany` and adds
+each chunk's counts to per-column NumPy arrays, so memory is bounded by the
+chunk size. Bin edges are either given up front or found with a first pass
+that only keeps each column's min and max, like the default range of
+`DataFrame.hist`. `plot_histograms` then draws the finished bins.
+"""
+import math
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from factbook_db import DB_PATH, get_pool
+
+BINS = 10
+CHUNK_SIZE = 10000
+
+
+def iter_chunks(query, db=DB_PATH, params=None, chunk_size=CHUNK_SIZE):
+    """Yield the column names once, then float arrays of up to `chunk_size` rows.
+
+    NULLs and values that are not numbers become NaN.
+    """
+    with get_pool(db).connection() as conn:
+        cursor = conn.execute(query, params or ())
+        yield [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            try:
+                yield np.array(rows, dtype=float)
+            except (TypeError, ValueError):
+                yield np.array(
+                    [[value if isinstance(value, (int, float)) else None for value in row] for row in rows],
+                    dtype=float,
+                )
+
+
+def column_ranges(query, db=DB_PATH, params=None, chunk_size=CHUNK_SIZE):
+    """First pass: the min and max of every column, ignoring NaN."""
+    chunks = iter_chunks(query, db, params, chunk_size)
+    columns = next(chunks)
+    lows = np.full(len(columns), np.inf)
+    highs = np.full(len(columns), -np.inf)
+    for chunk in chunks:
+        missing = np.isnan(chunk)
+        lows = np.minimum(lows, np.where(missing, np.inf, chunk).min(axis=0))
+        highs = np.maximum(highs, np.where(missing, -np.inf, chunk).max(axis=0))
+    return {column: (lows[i], highs[i]) for i, column in enumerate(columns)}
+
+
+def bin_edges(low, high, bins=BINS):
+    """Evenly spaced edges over `[low, high]`, widened like NumPy for a single value."""
+    return np.histogram_bin_edges([low, high], bins=bins)
+
+
+def sql_histograms(query, db=DB_PATH, params=None, bins=BINS, edges=None, chunk_size=CHUNK_SIZE):
+    """Bin every column of a query result, `chunk_size` rows at a time.
+
+    Args:
+        query (str): SQL whose columns to bin.
+        db (str): Database to run it on.
+        params (tuple or dict): Parameters bound to the query.
+        bins (int): Number of bins per column when edges are computed.
+        edges (dict): Fixed bin edges per column name, as a list or array
+            of edges, or a `(low, high)` tuple to split into `bins`. Columns
+            left out get a first pass over the data to find their range, and
+            are dropped if they hold no numbers at all, like text columns
+            in `DataFrame.hist`.
+        chunk_size (int): Number of rows fetched at a time.
+
+    Returns:
+        dict: Maps each column to its `(counts, edges)` arrays, like
+        `np.histogram`. NaN values are not counted.
+    """
+    edges = dict(edges or {})
+    chunks = iter_chunks(query, db, params, chunk_size)
+    columns = next(chunks)
+    missing = [column for column in columns if column not in edges]
+    if missing:
+        # give the connection back before the first pass borrows one
+        chunks.close()
+        ranges = column_ranges(query, db, params, chunk_size)
+        for column in missing:
+            if np.isfinite(ranges[column][0]):
+                edges[column] = ranges[column]
+        chunks = iter_chunks(query, db, params, chunk_size)
+        next(chunks)
+    binned = [(i, column) for i, column in enumerate(columns) if column in edges]
+    for i, column in binned:
+        if isinstance(edges[column], tuple):
+            edges[column] = bin_edges(*edges[column], bins=bins)
+        edges[column] = np.asarray(edges[column], dtype=float)
+
+    counts = {column: np.zeros(len(edges[column]) - 1, dtype=np.int64) for i, column in binned}
+    for chunk in chunks:
+        for i, column in binned:
+            values = chunk[:, i]
+            counts[column] += np.histogram(values[~np.isnan(values)], bins=edges[column])[0]
+    return {column: (counts[column], edges[column]) for i, column in binned}
+
+
+def plot_histograms(histograms, fig=None, figsize=(10, 10)):
+    """Draw precomputed bins in a grid of subplots, one per column.
+
+    Args:
+        histograms (dict): Output of `sql_histograms`.
+        fig (matplotlib Figure): Figure to draw in, a new one by default.
+        figsize (tuple): Size of the new figure.
+
+    Returns:
+        list of matplotlib Axes: One per column.
+    """
+    fig = fig or plt.figure(figsize=figsize)
+    cols = math.ceil(math.sqrt(len(histograms)))
+    rows = math.ceil(len(histograms) / cols)
+    axes = []
+    for i, (column, (counts, edges)) in enumerate(histograms.items()):
+        ax = fig.add_subplot(rows, cols, i + 1)
+        ax.hist(edges[:-1], bins=edges, weights=counts)
+        ax.set_title(column)
+        ax.grid(True)
+        axes.append(ax)
+    return axes
@@ -0,0 +1,148 @@
+"""Bulk load of CSV exports into the `facts` table.
+
+Refreshing `factbook.db` one `INSERT` and one commit per row spends nearly
+all its time syncing the journal. `load_csv` streams the CSV instead and
+inserts it with `executemany`, `BATCH_SIZE` rows per transaction, with the
+journal in WAL mode and `synchronous=OFF` for the duration of the load.
+The indexes and triggers on `facts`, such as the density ones of
+`factbook_density`, are dropped first and created again once all the rows
+are in, so they are built in one pass instead of updated on every insert.
+
+Values are inserted as the strings the CSV holds and SQLite's column
+affinity turns them into integers and floats. Empty fields become NULL
+through `NULLIF(?, '')` in the insert itself.
+
+    python factbook_load.py facts.csv [factbook.db] [--append]
+"""
+import argparse
+import csv
+import sqlite3
+import time
+from itertools import islice
+from operator import itemgetter
+
+from factbook_db import DB_PATH
+from factbook_density import DENSITY
+
+BATCH_SIZE = 100000
+# page cache during the load, mostly for building the indexes afterwards
+CACHE_KIB = 256 * 1024
+
+FACTS_SCHEMA = '''CREATE TABLE IF NOT EXISTS "facts" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "code" varchar(255) NOT NULL,
+    "name" varchar(255) NOT NULL,
+    "area" integer,
+    "area_land" integer,
+    "area_water" integer,
+    "population" integer,
+    "population_growth" float,
+    "birth_rate" float,
+    "death_rate" float,
+    "migration_rate" float,
+    "created_at" datetime,
+    "updated_at" datetime)'''
+
+
+def read_rows(path, columns):
+    """Yield the header fields that are `columns`, then those fields of every row.
+
+    The rows come straight out of `csv.reader`, picked with `itemgetter`
+    only when the CSV has columns to leave out, so nothing is done per
+    field in Python.
+    """
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        keep = [i for i, name in enumerate(header) if name in columns]
+        yield [header[i] for i in keep]
+        if len(keep) == len(header):
+            yield from reader
+        elif len(keep) == 1:
+            yield from ((row[keep[0]],) for row in reader)
+        else:
+            yield from map(itemgetter(*keep), reader)
+
+
+def load_csv(csv_path, db=DB_PATH, replace=True, batch_size=BATCH_SIZE):
+    """Load a CSV export into `facts`, creating the table if needed.
+
+    Args:
+        csv_path (str): CSV with a header row naming `facts` columns. Other
+            columns are ignored.
+        db (str): Database to load into.
+        replace (bool): Delete the rows already in `facts` first. Each batch
+            is its own transaction, so if the load fails part way the
+            batches before the error stay in.
+        batch_size (int): Rows per transaction.
+
+    Returns:
+        dict: 'rows' loaded, 'seconds' taken including the index rebuild,
+        and 'rows_per_second'.
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(db, isolation_level=None)
+    journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+    derived = []
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA cache_size={}'.format(-CACHE_KIB))
+        conn.execute(FACTS_SCHEMA)
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(facts)')]
+        derived = conn.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'facts' "
+            "AND type IN ('index', 'trigger') AND sql IS NOT NULL ORDER BY type").fetchall()
+
+        conn.execute('BEGIN')
+        for kind, name, sql in derived:
+            conn.execute('DROP {} IF EXISTS "{}"'.format(kind, name))
+        if replace:
+            conn.execute('DELETE FROM facts')
+        conn.execute('COMMIT')
+
+        rows = read_rows(csv_path, columns)
+        header = next(rows)
+        insert = 'INSERT INTO facts ({}) VALUES ({})'.format(
+            ', '.join('"{}"'.format(name) for name in header), ', '.join(["NULLIF(?, '')"] * len(header)))
+        loaded = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            conn.execute('BEGIN')
+            conn.executemany(insert, batch)
+            conn.execute('COMMIT')
+            loaded += len(batch)
+
+        conn.execute('BEGIN')
+        if 'density' in columns:
+            conn.execute('UPDATE facts SET density = {}'.format(DENSITY.format('')))
+        for kind, name, sql in derived:
+            conn.execute(sql)
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        # put back whatever indexes and triggers were already dropped
+        existing = {row[0] for row in conn.execute('SELECT name FROM sqlite_master')}
+        for kind, name, sql in derived:
+            if name not in existing:
+                conn.execute(sql)
+        raise
+    finally:
+        conn.execute('PRAGMA journal_mode={}'.format(journal_mode))
+        conn.close()
+    seconds = time.perf_counter() - start
+    return {'rows': loaded, 'seconds': seconds, 'rows_per_second': loaded / seconds if seconds else None}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk load a CSV export into the facts table.')
+    parser.add_argument('csv_path')
+    parser.add_argument('db', nargs='?', default=DB_PATH)
+    parser.add_argument('--append', action='store_true', help='keep the rows already in facts')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    stats = load_csv(args.csv_path, args.db, replace=not args.append, batch_size=args.batch_size)
+    print('{rows} rows in {seconds:.2f}s ({rows_per_second:,.0f} rows/s)'.format(**stats))
@@ -0,0 +1,218 @@
+"""Typed NumPy fetch path for numeric factbook queries.
+
+`pd.read_sql_query` collects every row as a Python tuple and then infers
+the column types of the whole object matrix. For numeric columns such as
+`population`, `birth_rate` and `death_rate`, `fetch_arrays` instead fills
+one preallocated typed array per column, chunk by chunk, growing them
+geometrically when they run out of room. Integer columns keep a separate
+NULL mask and float columns use NaN. `fetch_frame` wraps the arrays in a
+DataFrame without copying them, using pandas' nullable `Int64` for integer
+columns that have NULLs.
+
+The `sqlite3` module still builds a tuple per row, which is most of the
+time either way, so on a million rows the two take about as long. What
+changes is memory: only one chunk of tuples is alive at a time instead of
+the whole result, and the peak stays close to the size of the final
+arrays.
+"""
+import os
+import sqlite3
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from factbook_db import DB_PATH, get_pool
+
+CHUNK_SIZE = 8192
+GROWTH = 2
+
+
+class ColumnBuffer:
+    """A growable typed array for one result column, with a NULL mask.
+
+    The type follows the values seen so far: int64 while every value is an
+    integer or NULL, float64 once a float shows up, object once anything
+    else does. NULLs are NaN in float columns, 0 in int columns and None in
+    object columns, and True in the mask in every case.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.values = None
+        self.mask = np.zeros(capacity, dtype=bool)
+
+    def append(self, column):
+        values, nulls = typed_column(column)
+        n = len(values)
+        if self.size + n > self.capacity:
+            self._grow(self.size + n)
+        if self.values is None:
+            self.values = np.empty(self.capacity, dtype=values.dtype)
+        dtype = np.result_type(self.values.dtype, values.dtype)
+        if dtype != self.values.dtype:
+            self.values = with_nulls(self.values.astype(dtype), self.mask)
+        if dtype != values.dtype:
+            values = with_nulls(values.astype(dtype), nulls)
+        self.values[self.size:self.size + n] = values
+        if nulls is not None:
+            self.mask[self.size:self.size + n] = nulls
+        self.size += n
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= GROWTH
+        if self.values is not None:
+            values = np.empty(capacity, dtype=self.values.dtype)
+            values[:self.size] = self.values[:self.size]
+            self.values = values
+        mask = np.zeros(capacity, dtype=bool)
+        mask[:self.size] = self.mask[:self.size]
+        self.mask = mask
+        self.capacity = capacity
+
+    def arrays(self):
+        """Return views of the filled part of the values and the mask."""
+        if self.values is None:
+            return np.empty(0, dtype=np.float64), np.zeros(0, dtype=bool)
+        return self.values[:self.size], self.mask[:self.size]
+
+
+def typed_column(column):
+    """Convert a tuple of SQLite values to an int64, float64 or object array.
+
+    Returns:
+        tuple: The array and a boolean NULL mask, or None for the mask when
+        the column has no NULLs.
+    """
+    values = np.array(column)
+    if values.dtype.kind in 'if':
+        return values, None
+    if values.dtype.kind != 'O':
+        # text, or text mixed with numbers, which np.array turned into text
+        return np.array(column, dtype=object), None
+    nulls = np.equal(values, None)
+    rest = np.array(values[~nulls].tolist())
+    if rest.dtype.kind == 'i' or len(rest) == 0:
+        typed = np.zeros(len(values), dtype=np.int64)
+    elif rest.dtype.kind == 'f':
+        typed = np.full(len(values), np.nan)
+    else:
+        return values, nulls
+    typed[~nulls] = rest
+    return typed, nulls
+
+
+def with_nulls(values, nulls):
+    """Put NaN or None back in the NULL slots of a freshly cast array."""
+    if nulls is not None and values.dtype.kind in 'fO':
+        values[nulls] = np.nan if values.dtype.kind == 'f' else None
+    return values
+
+
+def fetch_arrays(query, db=DB_PATH, params=None, chunk_size=CHUNK_SIZE):
+    """Run `query` and return each column as a typed array and a NULL mask.
+
+    Args:
+        query (str): SQL to run.
+        db (str): Database to run it on.
+        params (tuple or dict): Parameters bound to the query.
+        chunk_size (int): Number of rows fetched at a time, also the
+            initial capacity of the arrays.
+
+    Returns:
+        dict: Maps each column name to a `(values, mask)` pair, where `mask`
+        is True for NULLs. NULL floats are also NaN in `values`.
+    """
+    with get_pool(db).connection() as conn:
+        cursor = conn.execute(query, params or ())
+        names = [column[0] for column in cursor.description]
+        buffers = [ColumnBuffer(chunk_size) for _ in names]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for buffer, column in zip(buffers, zip(*rows)):
+                buffer.append(column)
+    return {name: buffer.arrays() for name, buffer in zip(names, buffers)}
+
+
+def fetch_frame(query, db=DB_PATH, params=None, chunk_size=CHUNK_SIZE):
+    """`fetch_arrays` as a DataFrame built on the arrays without copying them.
+
+    Integer columns with NULLs become nullable `Int64` columns backed by the
+    values and the mask. Float columns keep NaN for NULL.
+    """
+    data = {}
+    for name, (values, mask) in fetch_arrays(query, db, params, chunk_size).items():
+        if values.dtype.kind == 'i' and mask.any():
+            data[name] = pd.arrays.IntegerArray(values, mask)
+        else:
+            data[name] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def make_benchmark_db(path, rows):
+    """Write a `facts`-like table of `rows` random numeric rows to `path`."""
+    rng = np.random.default_rng(0)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('''create table facts (
+            id integer primary key, population integer, birth_rate float, death_rate float)''')
+        population = rng.integers(0, 10 ** 9, rows)
+        births = np.round(rng.uniform(5, 50, rows), 2)
+        deaths = np.round(rng.uniform(1, 20, rows), 2)
+        conn.executemany(
+            'insert into facts values (?, ?, ?, ?)',
+            ((i, int(p) if i % 97 else None, float(b), float(d) if i % 89 else None)
+             for i, (p, b, d) in enumerate(zip(population, births, deaths))),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def measure(func, repeat):
+    """Best wall time of `func` in seconds, and its peak traced memory in bytes."""
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def benchmark(rows=1000000, repeat=3):
+    """Time `fetch_frame` against `pd.read_sql_query` on a generated table.
+
+    Returns:
+        dict: Maps 'read_sql_query' and 'fetch_frame' to their best time in
+        seconds and peak memory in bytes.
+    """
+    query = 'select population, birth_rate, death_rate from facts'
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        make_benchmark_db(path, rows)
+        pool = get_pool(path)
+
+        def read_sql():
+            with pool.connection() as conn:
+                return pd.read_sql_query(query, conn)
+
+        results = {
+            'read_sql_query': measure(read_sql, repeat),
+            'fetch_frame': measure(lambda: fetch_frame(query, path), repeat),
+        }
+        pool.close()
+    return results
+
+
+if __name__ == '__main__':
+    for name, (seconds, peak) in benchmark().items():
+        print("{:15} {:6.3f}s  peak {:6.1f} MB".format(name, seconds, peak / 2 ** 20))
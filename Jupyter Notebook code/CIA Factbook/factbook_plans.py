@@ -0,0 +1,242 @@
+"""EXPLAIN QUERY PLAN capture and an index advisor for the factbook queries.
+
+`query_4`, `query_5` and `query_6` filter on scalar subqueries such as
+`(select max(population) from facts)`, and `facts` only has its primary key,
+so every one of them reads the whole table. `PlanRecorder` wraps a
+`run_query` function and records the plan of every query it runs, flagging
+table scans and temporary B-trees. `propose_indexes` turns the flagged
+queries into `CREATE INDEX` statements for the columns they filter,
+aggregate or sort on, and `apply_indexes` creates them and benchmarks the
+queries before and after.
+
+    plans = PlanRecorder()
+    run_query = plans.wrap(run_query)
+    ...
+    plans.report()
+"""
+import re
+import sqlite3
+import threading
+import time
+
+from factbook_db import DB_PATH, get_pool
+
+REPEAT = 20
+
+SCAN = re.compile(r'^(?:SCAN|SEARCH) (?:TABLE )?(\w+)(.*)$')
+TEMP_BTREE = 'USE TEMP B-TREE'
+
+
+def explain(query, db=DB_PATH, params=None, conn=None):
+    """Return the `EXPLAIN QUERY PLAN` rows of `query` as `(id, parent, detail)`."""
+    if conn is None:
+        with get_pool(db).connection() as conn:
+            return explain(query, params=params, conn=conn)
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + query, params or ()).fetchall()
+    return [(row[0], row[1], row[-1]) for row in rows]
+
+
+def plan_problems(plan, tables=None):
+    """Flag the steps of a plan that read a whole table or sort in a temp B-tree.
+
+    A `SEARCH` without an index, which SQLite reports for some min()/max()
+    subqueries, reads the whole table too and is flagged as a scan.
+
+    Args:
+        plan (list of tuple): Rows from `explain`.
+        tables (set of str): Tables of the database. Steps over anything
+            else, like `SCAN CONSTANT ROW` or a subquery, are not scans of
+            a table. Every name is taken as a table if None.
+
+    Returns:
+        dict: 'scans' maps each fully read table to its plan steps, and
+        'temp_btrees' lists the temp B-tree steps.
+    """
+    scans = {}
+    temp_btrees = []
+    for node_id, parent, detail in plan:
+        match = SCAN.match(detail)
+        if match and 'USING' not in match.group(2) and (tables is None or match.group(1) in tables):
+            scans.setdefault(match.group(1), []).append(detail)
+        elif detail.startswith(TEMP_BTREE):
+            temp_btrees.append(detail)
+    return {'scans': scans, 'temp_btrees': temp_btrees}
+
+
+class PlanRecorder:
+    """Collect the query plan of every query run through `wrap`.
+
+    Args:
+        db (str): Database the plans are explained against by default.
+    """
+
+    def __init__(self, db=DB_PATH):
+        self.db = db
+        self.records = []
+        self.lock = threading.Lock()
+
+    def wrap(self, run_query):
+        """Return `run_query` that records the plan of each query before running it."""
+        def recorded_run_query(query, db=self.db, params=None, **kwargs):
+            self.record(query, db, params)
+            return run_query(query, db=db, params=params, **kwargs)
+        recorded_run_query.__doc__ = run_query.__doc__
+        return recorded_run_query
+
+    def record(self, query, db=None, params=None):
+        """Explain `query`, store the plan with its problems and return the record."""
+        db = db or self.db
+        plan = explain(query, db, params)
+        record = {'query': query, 'db': db, 'params': params, 'plan': plan}
+        record.update(plan_problems(plan, table_names(db)))
+        with self.lock:
+            self.records.append(record)
+        return record
+
+    def flagged(self):
+        """Return the records with a table scan or a temp B-tree."""
+        return [record for record in self.records if record['scans'] or record['temp_btrees']]
+
+    def report(self):
+        """Print every flagged query with its plan and the proposed indexes."""
+        for record in self.flagged():
+            print(' '.join(record['query'].split()))
+            for node_id, parent, detail in record['plan']:
+                print('    {}{}'.format('  ' * (parent > 0), detail))
+            for proposal in propose_indexes(record['query'], record['db'], record):
+                print('    -> ' + proposal)
+
+
+def table_names(db=DB_PATH):
+    """Names of the tables in `db`."""
+    with get_pool(db).connection() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def table_columns(table, db=DB_PATH):
+    with get_pool(db).connection() as conn:
+        return [row[1] for row in conn.execute('PRAGMA table_info({})'.format(table))]
+
+
+def existing_indexes(table, db=DB_PATH):
+    """Return the column tuples of the indexes already on `table`."""
+    with get_pool(db).connection() as conn:
+        names = [row[1] for row in conn.execute('PRAGMA index_list({})'.format(table))]
+        return {
+            tuple(row[2] for row in conn.execute('PRAGMA index_info({})'.format(name)))
+            for name in names
+        }
+
+
+def filter_columns(query, columns):
+    """Columns of `query` that are compared, sorted on or used in min()/max().
+
+    This is a heuristic over the SQL text, in the order the columns appear.
+    """
+    names = '|'.join(re.escape(column) for column in sorted(columns, key=len, reverse=True))
+    column = r'["`\[]?\b(' + names + r')\b["`\]]?'
+    patterns = [
+        r'\b(?:min|max)\s*\(\s*' + column + r'\s*\)',
+        column + r'\s*(?:==|=|!=|<>|<=|>=|<|>|\bin\b|\bbetween\b|\blike\b)',
+        r'\border\s+by\s+' + column,
+    ]
+    found = []
+    for pattern in patterns:
+        for match in re.finditer(pattern, query, re.IGNORECASE):
+            found.append((match.start(), match.group(1)))
+    ordered = []
+    for position, name in sorted(found):
+        if name not in ordered:
+            ordered.append(name)
+    return ordered
+
+
+def selected_columns(query, columns):
+    """The plain columns of the outermost select list, or None for `*` or expressions."""
+    match = re.match(r'\s*select\s+(.*?)\s+from\s', query, re.IGNORECASE | re.DOTALL)
+    if not match:
+        return None
+    selected = [item.strip().strip('"`[]') for item in match.group(1).split(',')]
+    if all(item in columns for item in selected):
+        return selected
+    return None
+
+
+def propose_indexes(query, db=DB_PATH, record=None):
+    """Propose `CREATE INDEX` statements for the scanned tables of `query`.
+
+    Every column the query filters, sorts or takes min()/max() of gets a
+    single-column index, which is also covering for min()/max() subqueries.
+    When the outer select list only names plain columns, an index led by
+    the first filtered column and followed by the selected ones is proposed
+    as well, so the query can be answered from the index alone. Indexes
+    that already exist are left out.
+
+    Returns:
+        list of str: The statements.
+    """
+    record = record or plan_problems(explain(query, db), table_names(db))
+    proposals = []
+    for table in record['scans']:
+        if table.startswith('sqlite_'):
+            continue
+        columns = table_columns(table, db)
+        if not columns:
+            continue
+        existing = existing_indexes(table, db)
+        wanted = [(column,) for column in filter_columns(query, columns)]
+        selected = selected_columns(query, columns)
+        if wanted and selected:
+            covering = wanted[0] + tuple(column for column in selected if column != wanted[0][0])
+            if len(covering) > 1:
+                wanted.append(covering)
+        for index_columns in wanted:
+            if not index_columns or not all(index_columns) or index_columns in existing:
+                continue
+            proposals.append('CREATE INDEX IF NOT EXISTS idx_{}_{} ON {} ({})'.format(
+                table, '_'.join(index_columns), table, ', '.join(index_columns)))
+    return proposals
+
+
+def time_query(conn, query, params=None, repeat=REPEAT):
+    """Best wall time of running `query` and fetching all rows, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query, params or ()).fetchall()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def apply_indexes(proposals, queries, db=DB_PATH, repeat=REPEAT):
+    """Create the proposed indexes and benchmark `queries` before and after.
+
+    This writes to `db`, so it opens its own read-write connection instead
+    of using the read-only pool.
+
+    Args:
+        proposals (list of str): `CREATE INDEX` statements.
+        queries (dict): Maps names to the queries to benchmark.
+        db (str): Database to change.
+        repeat (int): How many runs to take the best time from.
+
+    Returns:
+        dict: Maps each name to its 'before' and 'after' seconds and plans.
+    """
+    results = {}
+    conn = sqlite3.connect(db)
+    try:
+        for name, query in queries.items():
+            results[name] = {'before': time_query(conn, query, repeat=repeat),
+                             'plan_before': explain(query, conn=conn)}
+        with conn:
+            for statement in proposals:
+                conn.execute(statement)
+            conn.execute('ANALYZE')
+        for name, query in queries.items():
+            results[name].update({'after': time_query(conn, query, repeat=repeat),
+                                  'plan_after': explain(query, conn=conn)})
+    finally:
+        conn.close()
+    return results
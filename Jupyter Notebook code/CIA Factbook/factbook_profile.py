@@ -0,0 +1,154 @@
+"""Opt-in profiling of every query the factbook reports run.
+
+`QueryProfiler` wraps a `run_query` function, like `PlanRecorder` does, and
+records for every call its wall time, the rows returned, the bytes of the
+resulting DataFrame, the number of SQLite VM steps and the query plan. The
+records can be appended to a JSON lines log as they come in and summed up
+per query in a table, slowest first.
+
+    profiler = QueryProfiler(log_path='queries.jsonl')
+    run_query = profiler.wrap(run_query)
+    ...
+    profiler.summary()
+
+VM steps are counted with `set_progress_handler` on the connection the
+query runs on, so they are only available when the wrapped function takes
+a `conn` argument, like `factbook_db.run_query`. Others, such as the cached
+`factbook_cache.run_query`, get None: a cache hit runs no SQL at all.
+"""
+import inspect
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+
+from factbook_cache import normalize_sql
+from factbook_db import DB_PATH, get_pool
+from factbook_plans import explain
+
+STEP_INTERVAL = 100
+
+SUMMARY_COLUMNS = ['calls', 'seconds', 'mean_seconds', 'rows', 'bytes', 'vm_steps']
+
+
+class StepCounter:
+    """Progress handler that counts SQLite VM steps, `interval` at a time."""
+
+    def __init__(self, interval=STEP_INTERVAL):
+        self.interval = interval
+        self.steps = 0
+
+    def __call__(self):
+        self.steps += self.interval
+        # a true value would abort the query
+        return 0
+
+
+class QueryProfiler:
+    """Record the cost of every query run through `wrap`.
+
+    Args:
+        db (str): Database the wrapped function uses by default.
+        log_path (str): JSON lines file each record is appended to, if any.
+        step_interval (int): VM steps between two calls of the progress
+            handler, which is also the resolution of the step counts.
+        plans (bool): Whether to capture the query plan of each call.
+    """
+
+    def __init__(self, db=DB_PATH, log_path=None, step_interval=STEP_INTERVAL, plans=True):
+        self.db = db
+        self.log_path = log_path
+        self.step_interval = step_interval
+        self.plans = plans
+        self.records = []
+        self.lock = threading.Lock()
+
+    def wrap(self, run_query):
+        """Return `run_query` that profiles each query it runs."""
+        takes_conn = 'conn' in inspect.signature(run_query).parameters
+
+        def profiled_run_query(query, db=self.db, params=None, **kwargs):
+            conn = kwargs.pop('conn', None)
+            if takes_conn:
+                # profile the connection the caller passed, or one borrowed
+                # from the pool of `db`
+                borrowed = get_pool(db).connection() if conn is None else nullcontext(conn)
+                with borrowed as conn:
+                    plan = explain(query, params=params, conn=conn) if self.plans else None
+                    counter = StepCounter(self.step_interval)
+                    conn.set_progress_handler(counter, self.step_interval)
+                    try:
+                        start = time.perf_counter()
+                        result = run_query(query, db=db, params=params, conn=conn, **kwargs)
+                        seconds = time.perf_counter() - start
+                    finally:
+                        conn.set_progress_handler(None, 0)
+                steps = counter.steps
+            else:
+                plan = explain(query, db, params) if self.plans else None
+                start = time.perf_counter()
+                result = run_query(query, db=db, params=params, **kwargs)
+                seconds = time.perf_counter() - start
+                steps = None
+            self.record(query, db, params, seconds, result, steps, plan)
+            return result
+        profiled_run_query.__doc__ = run_query.__doc__
+        return profiled_run_query
+
+    def record(self, query, db, params, seconds, result, steps=None, plan=None):
+        """Store one call, append it to the log and return the record."""
+        record = {
+            'time': time.time(),
+            'query': normalize_sql(query),
+            'db': db,
+            'params': params,
+            'seconds': seconds,
+            'rows': len(result),
+            'bytes': int(result.memory_usage(index=True, deep=True).sum()),
+            'vm_steps': steps,
+            'plan': None if plan is None else [detail for node_id, parent, detail in plan],
+        }
+        with self.lock:
+            self.records.append(record)
+            if self.log_path is not None:
+                with open(self.log_path, 'a') as log:
+                    log.write(json.dumps(record, default=str) + '\n')
+        return record
+
+    def summary(self):
+        """Return the records summed up per query, slowest first."""
+        with self.lock:
+            return summarize(self.records)
+
+
+def summarize(records):
+    """Total calls, time, rows, bytes and VM steps per query.
+
+    Args:
+        records (list of dict): Records from `QueryProfiler` or `load_log`.
+
+    Returns:
+        pandas DataFrame: One row per distinct query, indexed by the SQL and
+        sorted by total seconds.
+    """
+    if not records:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    frame = pd.DataFrame(records)
+    frame['vm_steps'] = pd.to_numeric(frame['vm_steps'])
+    summary = frame.groupby('query').agg(
+        calls=('seconds', 'size'),
+        seconds=('seconds', 'sum'),
+        mean_seconds=('seconds', 'mean'),
+        rows=('rows', 'sum'),
+        bytes=('bytes', 'sum'),
+        vm_steps=('vm_steps', lambda steps: steps.sum(min_count=1)),
+    )
+    return summary.sort_values('seconds', ascending=False)
+
+
+def load_log(path):
+    """Read the records back from a `QueryProfiler` log."""
+    with open(path) as log:
+        return [json.loads(line) for line in log if line.strip()]
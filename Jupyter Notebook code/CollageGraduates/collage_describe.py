@@ -0,0 +1,217 @@
+"""`describe()` of a CSV read in chunks, before and after `dropna()`.
+
+`collage_analysis.py` loads `recent-grads.csv` whole and calls
+`recent_grads.describe()`, then `dropna()` and `describe()` again. For
+extracts larger than memory, `describe_csv` reads the file with
+`pd.read_csv(chunksize=...)` and keeps, per numeric column, the count,
+mean and sum of squared deviations of each chunk, merged into the running
+totals with Chan's parallel update of Welford's algorithm, along with the
+min, max and a `QuantileSketch` for the quartiles. Each chunk feeds two
+sets of statistics: one over every value, like the first `describe()`,
+and one over the rows without any NaN, like the second, so both tables
+come out of a single read.
+
+The quartiles come from the sketch and are within `RELATIVE_ACCURACY` of
+the exact ones. The other statistics match `describe()` up to floating
+point rounding.
+
+    full, complete_rows = describe_csv('recent-grads.csv')
+"""
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 100000
+RELATIVE_ACCURACY = 0.01
+PERCENTILES = (0.25, 0.5, 0.75)
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with a relative error bound (DDSketch).
+
+    Values are counted in logarithmic buckets `(gamma**(k-1), gamma**k]`,
+    mirrored for negative values, with a bucket of its own for zero. Any
+    value in a bucket is within `relative_accuracy` of the bucket's
+    midpoint, so a quantile read from the buckets is too. Sketches merge by
+    adding their bucket counts, and the number of buckets only grows with
+    the log of the range of the values, not with their number.
+
+    Args:
+        relative_accuracy (float): Largest relative error of a quantile.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.zeros = 0
+
+    def _bucket(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64)
+
+    def add(self, values):
+        """Count an array of values, which must not hold NaN."""
+        values = np.asarray(values, dtype=float)
+        zero = values == 0
+        self.zeros += int(zero.sum())
+        positive = values[values > 0]
+        negative = values[values < 0]
+        # negative buckets get negated keys below the lowest positive one,
+        # so one sorted key array orders every value
+        keys = np.concatenate([self._bucket(positive), -self._bucket(-negative) - (1 << 40)])
+        self._add_keys(keys, np.ones(len(keys), dtype=np.int64))
+
+    def _add_keys(self, keys, counts):
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts, minlength=len(self.keys)).astype(np.int64)
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same accuracy."""
+        self.zeros += other.zeros
+        self._add_keys(other.keys, other.counts)
+
+    def count(self):
+        return int(self.counts.sum()) + self.zeros
+
+    def _value(self, key):
+        if key < -(1 << 39):
+            return -self._value(-(key + (1 << 40)))
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def _ranked(self, rank, below_zero, cumulative):
+        """Value of the bucket holding the integer `rank`, counting from 0."""
+        if below_zero <= rank < below_zero + self.zeros:
+            return 0.0
+        i = int(np.searchsorted(cumulative, rank, side='right'))
+        return self._value(self.keys[min(i, len(self.keys) - 1)])
+
+    def quantile(self, q):
+        """Value at quantile `q`, interpolated between ranks like pandas' default."""
+        n = self.count()
+        if n == 0:
+            return np.nan
+        rank = q * (n - 1)
+        negative = self.keys < -(1 << 39)
+        below_zero = int(self.counts[negative].sum())
+        cumulative = np.cumsum(self.counts)
+        cumulative[~negative] += self.zeros
+        low = int(np.floor(rank))
+        value = self._ranked(low, below_zero, cumulative)
+        if rank > low:
+            value += (self._ranked(low + 1, below_zero, cumulative) - value) * (rank - low)
+        return value
+
+
+class ColumnStats:
+    """Running count, mean, squared deviations, min, max and quantiles."""
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, values):
+        """Merge a chunk of values without NaN into the totals (Chan et al.)."""
+        n = len(values)
+        if n == 0:
+            return
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.sketch.add(values)
+
+    def describe(self, percentiles=PERCENTILES):
+        """The column of `DataFrame.describe()` for these values."""
+        empty = self.count == 0
+        stats = [
+            self.count,
+            np.nan if empty else self.mean,
+            np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan,
+            np.nan if empty else self.min,
+        ]
+        # clamp to the exact extremes, which the bucket midpoints can overshoot
+        stats += [np.nan if empty else min(max(self.sketch.quantile(q), self.min), self.max)
+                  for q in percentiles]
+        stats.append(np.nan if empty else self.max)
+        return stats
+
+
+def describe_index(percentiles=PERCENTILES):
+    return ['count', 'mean', 'std', 'min'] + ['{:g}%'.format(q * 100) for q in percentiles] + ['max']
+
+
+class StreamingDescribe:
+    """`describe()` over all values and over complete rows, chunk by chunk.
+
+    Args:
+        relative_accuracy (float): Accuracy of the quartile sketches.
+        percentiles (tuple): Quantiles to report, like `describe()`.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY, percentiles=PERCENTILES):
+        self.relative_accuracy = relative_accuracy
+        self.percentiles = percentiles
+        self.columns = None
+        self.full = {}
+        self.complete = {}
+        self.rows = 0
+        self.complete_rows = 0
+
+    def add(self, chunk):
+        """Add a DataFrame chunk. Its first chunk fixes the numeric columns."""
+        if self.columns is None:
+            self.columns = list(chunk.select_dtypes(include='number').columns)
+            for column in self.columns:
+                self.full[column] = ColumnStats(self.relative_accuracy)
+                self.complete[column] = ColumnStats(self.relative_accuracy)
+        # like dropna(), a NaN in any column, numeric or not, drops the row
+        complete = chunk.notna().all(axis=1).to_numpy()
+        self.rows += len(chunk)
+        self.complete_rows += int(complete.sum())
+        for column in self.columns:
+            values = pd.to_numeric(chunk[column], errors='coerce').to_numpy(dtype=float)
+            present = ~np.isnan(values)
+            self.full[column].add(values[present])
+            self.complete[column].add(values[complete & present])
+
+    def tables(self):
+        """Return the `describe()` tables of all values and of complete rows."""
+        index = describe_index(self.percentiles)
+        return tuple(
+            pd.DataFrame({column: stats[column].describe(self.percentiles) for column in self.columns or []},
+                         index=index)
+            for stats in (self.full, self.complete)
+        )
+
+
+def describe_csv(path, chunksize=CHUNK_SIZE, relative_accuracy=RELATIVE_ACCURACY,
+                 percentiles=PERCENTILES, **read_csv_kwargs):
+    """`describe()` of a CSV before and after `dropna()`, in one chunked read.
+
+    Args:
+        path (str): CSV file.
+        chunksize (int): Rows read at a time.
+        relative_accuracy (float): Accuracy of the quartiles.
+        percentiles (tuple): Quantiles to report.
+        **read_csv_kwargs: Passed to `pd.read_csv`.
+
+    Returns:
+        tuple: Two DataFrames laid out like `describe()`, over all values
+        and over the rows without any NaN.
+    """
+    profile = StreamingDescribe(relative_accuracy, percentiles)
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs):
+        profile.add(chunk)
+    return profile.tables()
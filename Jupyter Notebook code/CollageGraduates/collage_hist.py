@@ -0,0 +1,158 @@
+"""Histograms of many DataFrame columns at once, with their edges cached.
+
+The two histogram cells of `collage_analysis.py` call
+`recent_grads[column].plot(kind='hist')` once per column, and every call
+scans its column for the range and again for the counts. `histograms`
+takes the DataFrame and all the columns: each column is converted to a
+float array, its min and max taken and its values binned in one task of a
+thread pool. The edges are kept in `EdgeCache` against the DataFrame, so
+histograms of the same frame later on only count.
+
+The cache holds a weak reference to the DataFrame: a new frame, such as
+the one `dropna()` returns, gets new edges, and a frame that is garbage
+collected drops its entries. Changing a frame in place does not, so call
+`edge_cache.invalidate(df)` after doing that.
+
+    hists = histograms(recent_grads, cols)
+    plot_histograms(hists, cols[:4], figsize=(5, 12), rot=40)
+"""
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from collage_matrix import uniform_bins
+
+BINS = 10
+
+
+class EdgeCache:
+    """Bin edges per DataFrame, column and bin count."""
+
+    def __init__(self):
+        self.frames = {}
+        self.hits = 0
+        self.misses = 0
+        # reentrant: a frame can be collected, and `_forget` run, while
+        # this thread holds the lock
+        self.lock = threading.RLock()
+
+    def _entries(self, df, create=False):
+        key = id(df)
+        entry = self.frames.get(key)
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        if not create:
+            return None
+        # drop the edges as soon as the frame is collected, so a new frame
+        # reusing its id starts empty
+        ref = weakref.ref(df, lambda ref, key=key: self._forget(key, ref))
+        self.frames[key] = (ref, {})
+        return self.frames[key][1]
+
+    def _forget(self, key, ref):
+        with self.lock:
+            if key in self.frames and self.frames[key][0] is ref:
+                del self.frames[key]
+
+    def get(self, df, column, bins):
+        with self.lock:
+            entries = self._entries(df)
+            edges = None if entries is None else entries.get((column, bins))
+            if edges is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return edges
+
+    def put(self, df, column, bins, edges):
+        with self.lock:
+            self._entries(df, create=True)[column, bins] = edges
+
+    def invalidate(self, df=None):
+        """Forget the edges of `df`, or of every frame."""
+        with self.lock:
+            if df is None:
+                self.frames.clear()
+            elif id(df) in self.frames and self.frames[id(df)][0]() is df:
+                del self.frames[id(df)]
+
+
+edge_cache = EdgeCache()
+
+
+def column_histogram(values, edges=None, bins=BINS):
+    """Counts and edges of one float array, like `np.histogram` without NaN.
+
+    Edges, when not given, span the min and max of the values, and the bins
+    are counted in the same task.
+    """
+    present = values[~np.isnan(values)]
+    if edges is None:
+        low, high = (present.min(), present.max()) if len(present) else (0.0, 1.0)
+        edges = np.histogram_bin_edges([low, high], bins=bins)
+    return np.bincount(uniform_bins(present, edges), minlength=len(edges) - 1), edges
+
+
+def histograms(df, columns, bins=BINS, cache=edge_cache, max_workers=None):
+    """Histograms of several columns of `df`, one column per thread.
+
+    Args:
+        df (pandas DataFrame): Data to bin.
+        columns (list of str): Columns to bin.
+        bins (int): Number of bins per column, like `plot(kind='hist')`.
+        cache (EdgeCache): Where edges are looked up and stored. None
+            computes them every time.
+        max_workers (int): Threads, the default of `ThreadPoolExecutor` if
+            None.
+
+    Returns:
+        dict: Maps each column to its `(counts, edges)`, like
+        `np.histogram`. NaN values are not counted.
+    """
+    def task(column):
+        series = df[column]
+        if series.dtype.kind == 'f':
+            values = series.to_numpy()
+        else:
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+        edges = cache.get(df, column, bins) if cache is not None else None
+        counts, edges = column_histogram(values, edges, bins)
+        if cache is not None:
+            cache.put(df, column, bins, edges)
+        return counts, edges
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(columns, executor.map(task, columns)))
+
+
+def plot_histograms(hists, columns=None, layout=None, fig=None, figsize=(5, 12), rot=0):
+    """Draw precomputed histograms, one subplot per column.
+
+    Args:
+        hists (dict): Output of `histograms`.
+        columns (list of str): Columns to draw, all of them by default.
+        layout (tuple): Rows and columns of subplots, one column by default
+            like the notebook.
+        fig (matplotlib Figure): Figure to draw in, a new one by default.
+        figsize (tuple): Size of the new figure.
+        rot (int): Rotation of the x tick labels.
+
+    Returns:
+        list of matplotlib Axes: One per column.
+    """
+    columns = list(hists) if columns is None else columns
+    rows, cols = layout or (len(columns), 1)
+    fig = fig or plt.figure(figsize=figsize)
+    axes = []
+    for i, column in enumerate(columns):
+        counts, edges = hists[column]
+        ax = fig.add_subplot(rows, cols, i + 1)
+        ax.stairs(counts, edges, fill=True)
+        ax.set_ylabel('Frequency')
+        ax.set_title(column)
+        ax.tick_params(axis='x', labelrotation=rot)
+        axes.append(ax)
+    return axes
@@ -0,0 +1,173 @@
+"""A scatter matrix of binned counts instead of points.
+
+`scatter_matrix(recent_grads[['Sample_size', 'Median', 'Unemployment_rate']])`
+draws every row in every off-diagonal panel, which stops being usable past
+about 100k rows. `binned_matrix` counts instead: each column gets one set
+of evenly spaced bin edges, shared by every panel it appears in, and is
+turned into bin indices once. Every off-diagonal panel is then a 2D
+histogram, the same counts as `np.histogram2d` over those edges, computed
+with one `np.bincount` per pair of columns, and the diagonal holds the 1D
+histograms. The pairs are counted in a thread pool, since NumPy releases
+the GIL for most of this.
+
+`plot_binned_matrix` draws the counts as images, so drawing costs the same
+for a thousand rows as for ten million.
+
+    matrix = binned_matrix(recent_grads, ['Sample_size', 'Median', 'Unemployment_rate'])
+    plot_binned_matrix(matrix, figsize=(10, 10))
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import LogNorm
+from pandas.plotting import scatter_matrix
+
+from collage_scatter import column_arrays, synthetic_grads
+
+BINS = 50
+
+
+def uniform_bins(values, edges):
+    """Bin of every value in `[edges[0], edges[-1]]` for evenly spaced `edges`.
+
+    The bin is computed from the spacing and then corrected against the
+    edges themselves, as `np.histogram` does, so a value sitting on an
+    interior edge goes to the bin that starts there even when the
+    multiplication rounds it down. The last bin includes its right edge.
+    Values must not be NaN.
+    """
+    bins = len(edges) - 1
+    index = ((values - edges[0]) * (bins / (edges[-1] - edges[0]))).astype(np.intp)
+    np.clip(index, 0, bins - 1, out=index)
+    index[values < edges[index]] -= 1
+    index[(values >= edges[index + 1]) & (index != bins - 1)] += 1
+    return index
+
+
+def bin_indices(values, edges):
+    """Bin of every value for evenly spaced `edges`, or -1 for NaN.
+
+    Like `np.histogram`, the last bin includes its right edge.
+    """
+    index = np.full(len(values), -1, dtype=np.intp)
+    present = ~np.isnan(values)
+    index[present] = uniform_bins(values[present], edges)
+    return index
+
+
+def pair_counts(x_index, y_index, x_bins, y_bins):
+    """2D histogram of two columns of bin indices, rows where both are present."""
+    present = (x_index >= 0) & (y_index >= 0)
+    cells = x_index[present] * y_bins + y_index[present]
+    return np.bincount(cells, minlength=x_bins * y_bins).reshape(x_bins, y_bins)
+
+
+def binned_matrix(df, columns, bins=BINS, max_workers=None):
+    """Count the diagonal and off-diagonal panels of a scatter matrix.
+
+    Args:
+        df (pandas DataFrame): Data to bin.
+        columns (list of str): Columns of the matrix, in order.
+        bins (int): Bins per column, shared by every panel.
+        max_workers (int): Threads counting panels, the default of
+            `ThreadPoolExecutor` if None.
+
+    Returns:
+        dict: 'columns' in order, 'edges' per column, 'diagonal' 1D counts
+        per column and 'pairs' 2D counts per `(x, y)` pair of different
+        columns, with x along the first axis. `(y, x)` is the transpose of
+        `(x, y)`. NaN values are left out, and so are rows with NaN in
+        either column of a pair.
+    """
+    arrays = column_arrays(df, columns)
+    edges = {}
+    for column, values in arrays.items():
+        present = values[~np.isnan(values)]
+        low, high = (present.min(), present.max()) if len(present) else (0.0, 1.0)
+        edges[column] = np.histogram_bin_edges([low, high], bins=bins)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        indices = dict(zip(columns, executor.map(lambda c: bin_indices(arrays[c], edges[c]), columns)))
+        diagonal = dict(zip(columns, executor.map(
+            lambda c: np.bincount(indices[c][indices[c] >= 0], minlength=bins), columns)))
+        pairs = list(combinations(columns, 2))
+        counts = executor.map(lambda pair: pair_counts(indices[pair[0]], indices[pair[1]], bins, bins), pairs)
+        matrix_pairs = {}
+        for (x, y), count in zip(pairs, counts):
+            matrix_pairs[x, y] = count
+            matrix_pairs[y, x] = count.T
+    return {'columns': list(columns), 'edges': edges, 'diagonal': diagonal, 'pairs': matrix_pairs}
+
+
+def plot_binned_matrix(matrix, figsize=(10, 10), cmap='Blues', fig=None):
+    """Draw a `binned_matrix` laid out like `pandas.plotting.scatter_matrix`.
+
+    Off-diagonal panels show the counts as an image on a log color scale,
+    with empty cells left blank. The diagonal panels show the histograms.
+
+    Returns:
+        numpy array of matplotlib Axes: The grid of panels.
+    """
+    columns = matrix['columns']
+    n = len(columns)
+    fig = fig or plt.figure(figsize=figsize)
+    axes = fig.subplots(n, n, squeeze=False)
+    peak = max([counts.max() for counts in matrix['pairs'].values()] + [1])
+    norm = LogNorm(vmin=1, vmax=max(peak, 2))
+    for i, y in enumerate(columns):
+        for j, x in enumerate(columns):
+            ax = axes[i, j]
+            x_edges = matrix['edges'][x]
+            if i == j:
+                counts = matrix['diagonal'][x]
+                ax.stairs(counts, x_edges, fill=True)
+            else:
+                counts = matrix['pairs'][x, y].astype(float)
+                counts[counts == 0] = np.nan
+                y_edges = matrix['edges'][y]
+                ax.pcolormesh(x_edges, y_edges, counts.T, cmap=cmap, norm=norm, rasterized=True)
+                ax.set_ylim(y_edges[0], y_edges[-1])
+            ax.set_xlim(x_edges[0], x_edges[-1])
+            ax.set_xlabel(x if i == n - 1 else '')
+            ax.set_ylabel(y if j == 0 else '')
+            if i < n - 1:
+                ax.set_xticklabels([])
+            if j > 0 or i == j:
+                # the diagonal's y axis holds counts, not the row's column
+                ax.set_yticklabels([])
+    fig.subplots_adjust(wspace=0, hspace=0)
+    return axes
+
+
+def benchmark(rows=1000000, columns=('Sample_size', 'Median', 'Unemployment_rate')):
+    """Time saving `scatter_matrix` against `binned_matrix` and its plot.
+
+    Returns:
+        dict: Seconds for 'scatter_matrix' and 'binned_matrix'.
+    """
+    df = synthetic_grads(rows)[list(columns)]
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        axes = scatter_matrix(df, figsize=(10, 10))
+        axes[0, 0].figure.savefig(os.path.join(tmp, 'scatter_matrix.png'))
+        plt.close(axes[0, 0].figure)
+        timings['scatter_matrix'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        axes = plot_binned_matrix(binned_matrix(df, list(columns)))
+        axes[0, 0].figure.savefig(os.path.join(tmp, 'binned_matrix.png'))
+        plt.close(axes[0, 0].figure)
+        timings['binned_matrix'] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == '__main__':
+    timings = benchmark()
+    print('scatter_matrix: {:.2f}s'.format(timings['scatter_matrix']))
+    print('binned_matrix:  {:.2f}s'.format(timings['binned_matrix']))
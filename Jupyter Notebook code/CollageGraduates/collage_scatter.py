@@ -0,0 +1,169 @@
+"""All the scatter plots of `collage_analysis.py` in one figure.
+
+The notebook calls `recent_grads.plot(x=..., y=..., kind='scatter')` seven
+times, and every call makes a new figure, pulls both columns out of the
+DataFrame again and draws each point as its own path. `scatter_panels`
+takes the list of pairs instead, converts every column it needs to a NumPy
+array once, and draws all the panels into one figure with rasterized
+markers, so the saved file holds one image per panel instead of millions
+of vector paths.
+
+Above `max_points`, a panel is decimated by density: points are binned on
+a grid about as fine as the panel's pixels, and only the first point of
+each occupied cell is drawn. Every cell that had a point still has one, so
+the shape and the outliers of the cloud are kept.
+
+    scatter_panels(recent_grads, SCATTER_PAIRS, path='scatter.png')
+"""
+import math
+import os
+import tempfile
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+SCATTER_PAIRS = [
+    ('Sample_size', 'Median'),
+    ('Sample_size', 'Unemployment_rate'),
+    ('Full_time', 'Median'),
+    ('ShareWomen', 'Unemployment_rate'),
+    ('Men', 'Median'),
+    ('Women', 'Median'),
+    ('Major_code', 'Median'),
+]
+
+MAX_POINTS = 100000
+GRID = 400
+NCOLS = 3
+PANEL_SIZE = 4
+DPI = 100
+
+
+def column_arrays(df, columns):
+    """Each of `columns` of `df` as a float array, with NaN for missing values."""
+    return {column: df[column].to_numpy(dtype=float, na_value=np.nan) for column in columns}
+
+
+def decimate(x, y, grid=GRID):
+    """Indices of at most one point per cell of a `grid` x `grid` binning.
+
+    Args:
+        x (numpy array): Horizontal values, without NaN.
+        y (numpy array): Vertical values, without NaN.
+        grid (int or tuple): Number of cells along each axis.
+
+    Returns:
+        numpy array: Sorted indices of the points to keep.
+    """
+    nx, ny = (grid, grid) if np.isscalar(grid) else grid
+    cells = cell_index(x, nx) * ny + cell_index(y, ny)
+    keep = np.unique(cells, return_index=True)[1]
+    keep.sort()
+    return keep
+
+
+def cell_index(values, n):
+    low, high = values.min(), values.max()
+    if high == low:
+        return np.zeros(len(values), dtype=np.int64)
+    index = ((values - low) * (n / (high - low))).astype(np.int64)
+    return np.minimum(index, n - 1)
+
+
+def scatter_panels(df, pairs=SCATTER_PAIRS, path=None, ncols=NCOLS, max_points=MAX_POINTS,
+                   grid=GRID, panel_size=PANEL_SIZE, dpi=DPI, markersize=3, **kwargs):
+    """Draw one scatter panel per `(x, y)` pair of `df` columns, in one figure.
+
+    Args:
+        df (pandas DataFrame): Data to plot.
+        pairs (list of tuple): `(x, y)` column names, one panel each.
+        path (str): File to save the figure to, if any. The format follows
+            the extension.
+        ncols (int): Panels per row.
+        max_points (int): Panels with more points are decimated by density.
+            None draws every point.
+        grid (int): Cells per axis for the decimation.
+        panel_size (float): Width and height of a panel in inches.
+        dpi (int): Resolution of the rasterized markers and of the file.
+        markersize (float): Marker size in points.
+        **kwargs: Passed to `Axes.plot`.
+
+    Returns:
+        matplotlib Figure: The figure, left open for further changes.
+    """
+    columns = list(dict.fromkeys(column for pair in pairs for column in pair))
+    arrays = column_arrays(df, columns)
+
+    nrows = math.ceil(len(pairs) / ncols)
+    fig, axes = plt.subplots(nrows, ncols, figsize=(ncols * panel_size, nrows * panel_size),
+                             squeeze=False, dpi=dpi)
+    kwargs.setdefault('color', 'C0')
+    for ax, (x_name, y_name) in zip(axes.flat, pairs):
+        x, y = arrays[x_name], arrays[y_name]
+        present = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[present], y[present]
+        if max_points is not None and len(x) > max_points:
+            keep = decimate(x, y, grid)
+            x, y = x[keep], y[keep]
+        # a line plot without lines draws the markers as a single path
+        ax.plot(x, y, linestyle='none', marker='o', markersize=markersize, rasterized=True, **kwargs)
+        ax.set_xlabel(x_name)
+        ax.set_ylabel(y_name)
+    for ax in axes.flat[len(pairs):]:
+        ax.set_visible(False)
+    fig.tight_layout()
+    if path is not None:
+        fig.savefig(path, dpi=dpi)
+    return fig
+
+
+def synthetic_grads(rows, seed=0):
+    """A `recent_grads`-like DataFrame of `rows` random majors, for benchmarks."""
+    rng = np.random.default_rng(seed)
+    men = rng.lognormal(8, 1.5, rows).round()
+    women = rng.lognormal(8, 1.5, rows).round()
+    total = men + women
+    full_time = (total * rng.uniform(0.3, 0.8, rows)).round()
+    employed = (total * rng.uniform(0.5, 0.9, rows)).round()
+    return pd.DataFrame({
+        'Major_code': rng.integers(1100, 6404, rows),
+        'Total': total,
+        'Men': men,
+        'Women': women,
+        'ShareWomen': women / np.where(total == 0, 1, total),
+        'Sample_size': rng.lognormal(5, 1.5, rows).round() + 2,
+        'Employed': employed,
+        'Full_time': full_time,
+        'Unemployment_rate': rng.beta(2, 25, rows),
+        'Median': rng.normal(40000, 11000, rows).round(-2).clip(22000, 110000),
+    })
+
+
+def benchmark(rows=1000000, pairs=SCATTER_PAIRS):
+    """Time saving the pandas scatter plots one by one against `scatter_panels`.
+
+    Returns:
+        dict: Seconds for 'pandas' and 'scatter_panels'.
+    """
+    df = synthetic_grads(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        for i, (x, y) in enumerate(pairs):
+            ax = df.plot(x=x, y=y, kind='scatter')
+            ax.figure.savefig(os.path.join(tmp, 'pandas_{}.png'.format(i)))
+            plt.close(ax.figure)
+        pandas_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fig = scatter_panels(df, pairs, path=os.path.join(tmp, 'panels.png'))
+        plt.close(fig)
+        panels_seconds = time.perf_counter() - start
+    return {'pandas': pandas_seconds, 'scatter_panels': panels_seconds}
+
+
+if __name__ == '__main__':
+    timings = benchmark()
+    print('pandas, one figure per pair: {:.2f}s'.format(timings['pandas']))
+    print('scatter_panels:              {:.2f}s'.format(timings['scatter_panels']))
@@ -157,6 +157,40 @@ for avg, hr in sorted_swap[:5]:
     )
 
 
+# # Streaming mode for large dumps
+# 
+# The cells above keep the whole file plus three lists of posts in memory. `hn_stream` classifies the rows, sums the comments and fills `comments_by_hour`/`counts_by_hour` in a single pass, so it also works on the full multi-GB export.
+
+# In[ ]:
+
+
+from hn_stream import stream_stats, print_top_hours
+
+stats = stream_stats("hacker_news.csv")
+print(stats.avg_ask_comments)
+print(stats.avg_show_comments)
+print_top_hours(stats.sorted_swap())
+
+
+# # Vectorized hour bucketing
+# 
+# `created_at` always has the `%m/%d/%Y %H:%M` layout, so `hn_hours` slices the hour out as an integer and builds the per-hour tables with `np.bincount` instead of calling `strptime` on every post.
+
+# In[ ]:
+
+
+import numpy as np
+from hn_hours import hour_tables, parse_hours, sorted_hours
+
+hours = parse_hours([post[6] for post in ask_posts])
+comments = np.array([int(post[4]) for post in ask_posts])
+comments_by_hour, counts_by_hour, avg_by_hour = hour_tables(hours, comments)
+
+top_hours, top_avgs = sorted_hours(avg_by_hour)
+for hr, avg in zip(top_hours[:5], top_avgs[:5]):
+    print("{:02d}:00: {:.2f} average comments per post".format(hr, avg))
+
+
 # In[ ]:
 
 
@@ -0,0 +1,296 @@
+"""Synthetic data generator and scaling benchmark for the HN analysis.
+
+`generate_csv` writes a `hacker_news.csv` lookalike of any size with the
+columns of the real dump and roughly its distributions: about 9% Ask HN and
+6% Show HN titles in mixed case, a few Tell/Launch HN posts, heavy-tailed
+comment and point counts, and timestamps over a year with a daily cycle.
+
+`run_pipeline` times every stage of an analysis separately (load, classify,
+average, hour bucketing, sorting) and records the peak RSS after each one.
+`run_suite` runs every size and pipeline in a fresh process, so the peak RSS
+of one run does not leak into the next, and appends the results as json
+lines that can be compared between commits.
+
+    python hn_bench.py generate 1000000 hn_1m.csv
+    python hn_bench.py run notebook hn_1m.csv
+    python hn_bench.py suite --sizes 10k 1M 50M --out bench_results.jsonl
+"""
+import argparse
+import csv
+import datetime as dt
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from hn_columns import HNColumns, build_cache
+from hn_hours import hour_tables, sorted_hours
+from hn_stream import DATE_FORMAT, stream_stats
+from hn_timezones import SOURCE_ZONE
+
+HEADER = ['id', 'title', 'url', 'num_points', 'num_comments', 'author', 'created_at']
+
+PREFIXES = [
+    ('Ask HN: ', 0.07), ('Ask HN - ', 0.01), ('ask hn: ', 0.007),
+    ('Show HN: ', 0.05), ('Show HN - ', 0.005), ('show hn: ', 0.005),
+    ('Tell HN: ', 0.003), ('Launch HN: ', 0.002),
+]
+WORDS = (
+    'why how the a new open source python rust database startup google apple '
+    'show your first year data learning from scale, "fast" engine web'
+).split()
+DOMAINS = ['github.com', 'medium.com', 'nytimes.com', 'techcrunch.com', 'youtube.com',
+           'arstechnica.com', 'bloomberg.com', 'wired.com', 'theverge.com', 'arxiv.org']
+
+# share of posts created in each hour of the day, peaking in US working hours
+HOUR_WEIGHTS = np.array([
+    3, 2.5, 2, 2, 2, 2.5, 3, 4, 5, 6, 6.5, 7, 7, 7, 6.5, 6, 5.5, 5, 4.5, 4, 4, 3.5, 3.5, 3,
+])
+
+SIZES = {'10k': 10000, '1M': 1000000, '50M': 50000000}
+
+PIPELINES = ('notebook', 'stream', 'columns')
+
+CHUNK_SIZE = 100000
+
+
+def generate_csv(path, rows, seed=0, chunk_size=CHUNK_SIZE):
+    """Write a synthetic Hacker News dump with `rows` posts to `path`.
+
+    Args:
+        path (str): Where to write the csv file.
+        rows (int): Number of posts.
+        seed (int): Seed of the random generator, for reproducible files.
+        chunk_size (int): Number of rows generated at a time.
+
+    Timestamps are wall-clock times in `SOURCE_ZONE`. A time that falls in
+    the hour skipped when DST starts is moved an hour later, so every
+    timestamp exists in that zone.
+    """
+    rng = np.random.default_rng(seed)
+    prefixes = [prefix for prefix, share in PREFIXES] + ['']
+    prefix_p = [share for prefix, share in PREFIXES]
+    prefix_p.append(1 - sum(prefix_p))
+    hour_p = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+    start = dt.datetime(2015, 9, 1)
+    zone = ZoneInfo(SOURCE_ZONE)
+    utc = dt.timezone.utc
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        for first in range(0, rows, chunk_size):
+            n = min(chunk_size, rows - first)
+            prefix = rng.choice(len(prefixes), n, p=prefix_p)
+            words = rng.integers(0, len(WORDS), (n, 6))
+            lengths = rng.integers(2, 7, n)
+            comments = np.minimum(rng.pareto(1.3, n) * 2, 5000).astype(int)
+            points = np.minimum(rng.pareto(1.1, n) * 3 + 1, 10000).astype(int)
+            days = rng.integers(0, 366, n)
+            hours = rng.choice(24, n, p=hour_p)
+            minutes = rng.integers(0, 60, n)
+            domains = rng.integers(-len(DOMAINS), len(DOMAINS), n)
+            authors = rng.zipf(1.5, n) % 200000
+            batch = []
+            for i in range(n):
+                created = start + dt.timedelta(days=int(days[i]), hours=int(hours[i]), minutes=int(minutes[i]))
+                # a round trip through UTC moves times in the DST gap past it
+                created = created.replace(tzinfo=zone).astimezone(utc).astimezone(zone)
+                title = prefixes[prefix[i]] + ' '.join(WORDS[w] for w in words[i, :lengths[i]])
+                url = 'https://{}/{}'.format(DOMAINS[domains[i]], first + i) if domains[i] >= 0 else ''
+                batch.append([
+                    10000000 + first + i, title, url, points[i], comments[i],
+                    'user{}'.format(authors[i]),
+                    '{}/{}/{} {}:{:02d}'.format(created.month, created.day, created.year,
+                                                created.hour, created.minute),
+                ])
+            writer.writerows(batch)
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / 2 ** 20
+    return peak / 2 ** 10
+
+
+class StageTimer:
+    """Record the wall time and the peak RSS after each stage of a run."""
+
+    def __init__(self):
+        self.stages = []
+        self.last = time.perf_counter()
+
+    def done(self, stage):
+        now = time.perf_counter()
+        self.stages.append({'stage': stage, 'seconds': now - self.last, 'peak_rss_mb': peak_rss_mb()})
+        self.last = now
+
+
+def notebook_pipeline(path, timer):
+    """The cells of `HackerNews.py`, timed stage by stage."""
+    with open(path, newline='', encoding='utf-8') as file:
+        hn = list(csv.reader(file))[1:]
+    timer.done('load')
+
+    ask_posts = []
+    show_posts = []
+    other_posts = []
+    for row in hn:
+        title = row[1].lower()
+        if title.startswith('ask hn'):
+            ask_posts.append(row)
+        elif title.startswith('show hn'):
+            show_posts.append(row)
+        else:
+            other_posts.append(row)
+    timer.done('classify')
+
+    avg_ask_comments = sum(int(row[4]) for row in ask_posts) / len(ask_posts)
+    avg_show_comments = sum(int(row[4]) for row in show_posts) / len(show_posts)
+    timer.done('average')
+
+    comments_by_hour = {}
+    counts_by_hour = {}
+    for post in ask_posts:
+        time_ = dt.datetime.strptime(post[6], DATE_FORMAT).strftime("%H")
+        comments_by_hour[time_] = comments_by_hour.get(time_, 0) + int(post[4])
+        counts_by_hour[time_] = counts_by_hour.get(time_, 0) + 1
+    timer.done('hour bucketing')
+
+    sorted_swap = sorted(
+        [[comments_by_hour[hr] / counts_by_hour[hr], hr] for hr in comments_by_hour], reverse=True
+    )
+    timer.done('sorting')
+    return avg_ask_comments, avg_show_comments, sorted_swap[:5]
+
+
+def stream_pipeline(path, timer):
+    """`hn_stream` does load, classify, average and bucketing in one pass."""
+    stats = stream_stats(path)
+    timer.done('load+classify+average+hour bucketing')
+    sorted_swap = stats.sorted_swap()
+    timer.done('sorting')
+    return stats.avg_ask_comments, stats.avg_show_comments, sorted_swap[:5]
+
+
+def columns_pipeline(path, timer):
+    """`hn_columns`, with the one-time cache build timed as its own stage."""
+    cache_dir = path + '.columns'
+    build_cache(path, cache_dir)
+    timer.done('build cache')
+    columns = HNColumns(cache_dir)
+    timer.done('load')
+    ask = columns.post_type == columns.code('ask')
+    show = columns.post_type == columns.code('show')
+    timer.done('classify')
+    avg_ask_comments = columns.num_comments[ask].sum(dtype=np.int64) / np.count_nonzero(ask)
+    avg_show_comments = columns.num_comments[show].sum(dtype=np.int64) / np.count_nonzero(show)
+    timer.done('average')
+    avg_by_hour = hour_tables(columns.hours()[ask], columns.num_comments[ask])[2]
+    timer.done('hour bucketing')
+    top_hours, top_avgs = sorted_hours(avg_by_hour)
+    timer.done('sorting')
+    return avg_ask_comments, avg_show_comments, list(zip(top_avgs[:5].tolist(), top_hours[:5].tolist()))
+
+
+def run_pipeline(pipeline, path):
+    """Run one pipeline over `path` and return its timings as a dict."""
+    timer = StageTimer()
+    start = timer.last
+    run = {'notebook': notebook_pipeline, 'stream': stream_pipeline, 'columns': columns_pipeline}
+    avg_ask_comments, avg_show_comments, top_hours = run[pipeline](path, timer)
+    return {
+        'pipeline': pipeline,
+        'path': path,
+        'bytes': os.path.getsize(path),
+        'stages': timer.stages,
+        'total_seconds': timer.last - start,
+        'peak_rss_mb': peak_rss_mb(),
+        'avg_ask_comments': avg_ask_comments,
+        'avg_show_comments': avg_show_comments,
+    }
+
+
+def run_suite(sizes, pipelines, data_dir, out):
+    """Generate the missing inputs and run every pipeline in its own process.
+
+    Args:
+        sizes (list of str): Keys of `SIZES`, e.g. ['10k', '1M'].
+        pipelines (list of str): Names from `PIPELINES`.
+        data_dir (str): Directory for the generated csv files.
+        out (str): json lines file the results are appended to.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    for size in sizes:
+        path = os.path.join(data_dir, 'hacker_news_{}.csv'.format(size))
+        if not os.path.exists(path):
+            print("generating {}".format(path))
+            generate_csv(path, SIZES[size])
+        for pipeline in pipelines:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), 'run', pipeline, path],
+                check=True, stdout=subprocess.PIPE, universal_newlines=True,
+            ).stdout
+            result = json.loads(output)
+            result['size'] = size
+            result['commit'] = git_commit()
+            with open(out, 'a') as file:
+                file.write(json.dumps(result) + '\n')
+            print_result(result)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_result(result):
+    print("{} rows, {} pipeline: {:.2f}s, peak RSS {:.0f} MB".format(
+        result.get('size', result['path']), result['pipeline'],
+        result['total_seconds'], result['peak_rss_mb']))
+    for stage in result['stages']:
+        print("    {:<40} {:>9.3f}s {:>9.0f} MB".format(
+            stage['stage'], stage['seconds'], stage['peak_rss_mb']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='write a synthetic dump')
+    generate.add_argument('rows', type=int)
+    generate.add_argument('path')
+    generate.add_argument('--seed', type=int, default=0)
+
+    run = commands.add_parser('run', help='time one pipeline, print json')
+    run.add_argument('pipeline', choices=PIPELINES)
+    run.add_argument('path')
+
+    suite = commands.add_parser('suite', help='time every size and pipeline')
+    suite.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['10k', '1M'])
+    suite.add_argument('--pipelines', nargs='+', choices=PIPELINES, default=list(PIPELINES))
+    suite.add_argument('--data-dir', default='bench_data')
+    suite.add_argument('--out', default='bench_results.jsonl')
+
+    args = parser.parse_args(argv)
+    if args.command == 'generate':
+        generate_csv(args.path, args.rows, seed=args.seed)
+    elif args.command == 'run':
+        print(json.dumps(run_pipeline(args.pipeline, args.path)))
+    else:
+        run_suite(args.sizes, args.pipelines, args.data_dir, args.out)
+
+
+if __name__ == '__main__':
+    main()
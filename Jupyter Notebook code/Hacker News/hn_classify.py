@@ -0,0 +1,130 @@
+"""Configurable title-prefix classifier for Hacker News post types.
+
+The notebook lowercases every title and then chains `startswith('ask hn')`
+and `startswith('show hn')`. `PrefixClassifier` stores any number of
+prefixes in a trie whose nodes are shared between the lower and upper case
+of each character, so a title is matched case-insensitively by walking at
+most as many characters as the longest prefix, without lowercasing it.
+"""
+import timeit
+
+import numpy as np
+
+from hn_stream import TITLE_COL, read_posts
+
+DEFAULT_PREFIXES = {
+    'ask hn': 'ask',
+    'show hn': 'show',
+    'tell hn': 'tell',
+    'launch hn': 'launch',
+}
+
+END = None
+
+
+class PrefixClassifier:
+    """Label titles by the longest configured prefix they start with.
+
+    Args:
+        prefixes (dict): Maps a prefix, in any case, to its label.
+        default (str): Label of titles that match no prefix.
+    """
+
+    def __init__(self, prefixes=None, default='other'):
+        prefixes = DEFAULT_PREFIXES if prefixes is None else prefixes
+        self.default = default
+        self.root = {}
+        self.depth = 0
+        labels = [default]
+        for prefix, label in prefixes.items():
+            self.add(prefix, label)
+            if label not in labels:
+                labels.append(label)
+        self.labels = tuple(labels)
+
+    def add(self, prefix, label):
+        """Add `prefix` to the trie, matching it regardless of case."""
+        node = self.root
+        for char in prefix.lower():
+            child = node.get(char)
+            if child is None:
+                child = {}
+                for variant in (char, char.upper()):
+                    if len(variant) == 1:
+                        node[variant] = child
+            node = child
+        node[END] = label
+        self.depth = max(self.depth, len(prefix))
+
+    def __call__(self, title):
+        """Return the label of `title`."""
+        node = self.root
+        label = self.default
+        for char in title[:self.depth]:
+            node = node.get(char)
+            if node is None:
+                break
+            label = node.get(END, label)
+        return label
+
+    def classify_many(self, titles):
+        """Label a whole column of titles.
+
+        Titles whose first character starts no prefix, which is most of
+        them, are labelled without entering the trie.
+        """
+        root = self.root
+        default = self.default
+        return [self(title) if title[:1] in root else default for title in titles]
+
+    def codes(self, titles):
+        """Label a column of titles as uint8 indexes into `self.labels`."""
+        index = {label: code for code, label in enumerate(self.labels)}
+        return np.fromiter((index[label] for label in self.classify_many(titles)), dtype=np.uint8)
+
+
+def chained_startswith(titles, prefixes):
+    """The notebook's approach, extended to many prefixes, as a baseline."""
+    labels = []
+    for title in titles:
+        title = title.lower()
+        for prefix, label in prefixes.items():
+            if title.startswith(prefix):
+                labels.append(label)
+                break
+        else:
+            labels.append('other')
+    return labels
+
+
+def benchmark(titles, prefix_counts=(2, 4, 16, 64, 256), repeat=3):
+    """Time the trie against chained `startswith` as the prefix count grows.
+
+    The four standard prefixes are padded with made-up `<word> hn` ones.
+
+    Args:
+        titles (list of str): Titles to label.
+        prefix_counts (iterable of int): Number of prefixes to try.
+        repeat (int): How many runs to take the best time from.
+
+    Returns:
+        list of tuple: `(prefix count, startswith seconds, trie seconds)`.
+    """
+    results = []
+    for count in prefix_counts:
+        prefixes = dict(list(DEFAULT_PREFIXES.items())[:count])
+        for i in range(len(prefixes), count):
+            prefixes['x{} hn'.format(i)] = 'x{}'.format(i)
+        classifier = PrefixClassifier(prefixes)
+        chained = timeit.repeat(lambda: chained_startswith(titles, prefixes), number=1, repeat=repeat)
+        trie = timeit.repeat(lambda: classifier.classify_many(titles), number=1, repeat=repeat)
+        results.append((count, min(chained), min(trie)))
+    return results
+
+
+if __name__ == '__main__':
+    titles = [row[TITLE_COL] for row in read_posts("hacker_news.csv")]
+    print("{} titles".format(len(titles)))
+    print("prefixes  startswith      trie")
+    for count, chained, trie in benchmark(titles):
+        print("{:>8}  {:>9.4f}s  {:>7.4f}s".format(count, chained, trie))
@@ -0,0 +1,209 @@
+"""Memory-mapped columnar cache of `hacker_news.csv`.
+
+The csv text is parsed once into typed column files:
+
+* `num_comments.i4`, `num_points.i4`: int32 counts
+* `created_at.i4`: int32 minutes since the epoch, in the dump's own zone
+* `post_type.u1`: uint8 code into `POST_TYPES`, from the title prefix
+* `id.i8`: int64 post ids
+* `titles.bin` + `title_offsets.i8`: utf-8 titles back to back and the
+  offset of each one, with a final offset for the end of the blob
+
+Later runs memory-map these files, so the Ask/Show averages and the hourly
+tables are NumPy reductions over the mapped arrays instead of a csv parse.
+"""
+import datetime as dt
+import json
+import os
+
+import numpy as np
+
+from hn_hours import hour_tables, sorted_hours
+from hn_stream import (
+    COMMENTS_COL, CREATED_AT_COL, ID_COL, POINTS_COL, TITLE_COL, classify_title, read_posts,
+)
+
+CHUNK_SIZE = 100000
+
+POST_TYPES = ('other', 'ask', 'show')
+
+COLUMNS = {
+    'id': np.int64,
+    'num_comments': np.int32,
+    'num_points': np.int32,
+    'created_at': np.int32,
+    'post_type': np.uint8,
+    'title_offsets': np.int64,
+}
+
+EXTENSIONS = {np.int64: 'i8', np.int32: 'i4', np.uint8: 'u1'}
+
+EPOCH = dt.date(1970, 1, 1)
+
+
+def column_path(cache_dir, name):
+    return os.path.join(cache_dir, '{}.{}'.format(name, EXTENSIONS[COLUMNS[name]]))
+
+
+class MinuteParser:
+    """Convert `%m/%d/%Y %H:%M` strings to minutes since the epoch.
+
+    There are only a few thousand distinct days in a dump, so the day part
+    is looked up in a dict and only the hour and minute are parsed per row.
+    """
+
+    def __init__(self):
+        self.days = {}
+
+    def __call__(self, date):
+        day, time = date.split(' ')
+        days = self.days.get(day)
+        if days is None:
+            month, mday, year = day.split('/')
+            days = (dt.date(int(year), int(month), int(mday)) - EPOCH).days
+            self.days[day] = days
+        hours, minutes = time.split(':')
+        return days * 1440 + int(hours) * 60 + int(minutes)
+
+
+def source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def build_cache(csv_path, cache_dir, classify=classify_title, post_types=POST_TYPES,
+                chunk_size=CHUNK_SIZE):
+    """Parse `csv_path` once into typed column files under `cache_dir`.
+
+    Rows are converted in chunks and appended to the column files, so
+    memory stays bounded by `chunk_size`.
+
+    Args:
+        csv_path (str): Location of the Hacker News csv dump.
+        cache_dir (str): Directory for the column files, created if missing.
+        classify (function): Maps a title to a name in `post_types`.
+        post_types (tuple of str): Post types to code, e.g. the `labels` of
+            a `hn_classify.PrefixClassifier`.
+        chunk_size (int): Number of rows converted at a time.
+
+    Returns:
+        int: Number of rows written.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    codes = {name: code for code, name in enumerate(post_types)}
+    to_minutes = MinuteParser()
+    files = {name: open(column_path(cache_dir, name), 'wb') for name in COLUMNS}
+    rows = 0
+    offset = 0
+    try:
+        with open(os.path.join(cache_dir, 'titles.bin'), 'wb') as titles:
+            chunk = {name: [] for name in COLUMNS}
+            for row in read_posts(csv_path):
+                title = row[TITLE_COL].encode('utf-8')
+                chunk['id'].append(int(row[ID_COL]))
+                chunk['num_comments'].append(int(row[COMMENTS_COL]))
+                chunk['num_points'].append(int(row[POINTS_COL]))
+                chunk['created_at'].append(to_minutes(row[CREATED_AT_COL]))
+                chunk['post_type'].append(codes[classify(row[TITLE_COL])])
+                chunk['title_offsets'].append(offset)
+                titles.write(title)
+                offset += len(title)
+                rows += 1
+                if rows % chunk_size == 0:
+                    write_chunk(files, chunk)
+            chunk['title_offsets'].append(offset)
+            write_chunk(files, chunk)
+    finally:
+        for file in files.values():
+            file.close()
+    meta = {'rows': rows, 'post_types': post_types, 'source': source_signature(csv_path)}
+    with open(os.path.join(cache_dir, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    return rows
+
+
+def write_chunk(files, chunk):
+    for name, values in chunk.items():
+        np.array(values, dtype=COLUMNS[name]).tofile(files[name])
+        values.clear()
+
+
+class HNColumns:
+    """Memory-mapped view of a column cache built by `build_cache`.
+
+    Each column is available as an attribute, e.g. `columns.num_comments`.
+    """
+
+    def __init__(self, cache_dir):
+        with open(os.path.join(cache_dir, 'meta.json')) as file:
+            self.meta = json.load(file)
+        self.rows = self.meta['rows']
+        self.post_types = tuple(self.meta['post_types'])
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, mmap_column(column_path(cache_dir, name), dtype))
+        self.titles = mmap_column(os.path.join(cache_dir, 'titles.bin'), np.uint8)
+
+    def __len__(self):
+        return self.rows
+
+    def title(self, i):
+        """Return the title of row `i`."""
+        start, end = self.title_offsets[i], self.title_offsets[i + 1]
+        return self.titles[start:end].tobytes().decode('utf-8')
+
+    def code(self, post_type):
+        return self.post_types.index(post_type)
+
+    def hours(self):
+        """Return the hour each post was created at, 0-23."""
+        return (self.created_at % 1440) // 60
+
+
+def mmap_column(path, dtype):
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+def open_cache(csv_path, cache_dir=None):
+    """Return the `HNColumns` of `csv_path`, building the cache if it is stale.
+
+    Args:
+        csv_path (str): Location of the Hacker News csv dump.
+        cache_dir (str): Cache location, `<csv_path>.columns` by default.
+
+    Returns:
+        HNColumns: The memory-mapped columns.
+    """
+    cache_dir = cache_dir or csv_path + '.columns'
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    fresh = False
+    if os.path.exists(meta_path):
+        with open(meta_path) as file:
+            fresh = json.load(file)['source'] == source_signature(csv_path)
+    if not fresh:
+        build_cache(csv_path, cache_dir)
+    return HNColumns(cache_dir)
+
+
+def average_comments(columns, post_type):
+    """Return the average comments of the posts of `post_type`."""
+    mask = columns.post_type == columns.code(post_type)
+    return columns.num_comments[mask].sum(dtype=np.int64) / np.count_nonzero(mask)
+
+
+def hourly_stats(columns, post_type='ask'):
+    """Return `comments_by_hour`, `counts_by_hour` and `avg_by_hour` arrays."""
+    mask = columns.post_type == columns.code(post_type)
+    return hour_tables(columns.hours()[mask], columns.num_comments[mask])
+
+
+if __name__ == '__main__':
+    columns = open_cache("hacker_news.csv")
+    print(average_comments(columns, 'ask'))
+    print(average_comments(columns, 'show'))
+    comments_by_hour, counts_by_hour, avg_by_hour = hourly_stats(columns)
+    top_hours, top_avgs = sorted_hours(avg_by_hour)
+    print("Top 5 Hours for 'Ask HN' Comments")
+    for hr, avg in zip(top_hours[:5], top_avgs[:5]):
+        print("{:02d}:00: {:.2f} average comments per post".format(hr, avg))
@@ -0,0 +1,313 @@
+"""Feed the Hacker News analysis from the item API instead of a csv dump.
+
+Items are pulled with asyncio from any service that serves the HN API
+layout (`/v0/maxitem.json`, `/v0/item/<id>.json`), turned into rows shaped
+like `hacker_news.csv` and folded straight into an `HNStats`:
+
+* a fixed number of fetch tasks caps the requests in flight,
+* they share a bounded pool of keep-alive HTTP/1.1 connections,
+* fetched rows go through a bounded queue to a single aggregating task, so
+  when aggregation falls behind the fetchers wait instead of buffering.
+
+Only the standard library is used. `serve_items` starts a local stand-in of
+the API, which is what `python hn_fetch.py --local hacker_news.csv` uses to
+check the results against `hn_stream`.
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo
+
+from hn_stream import (
+    AUTHOR_COL, COMMENTS_COL, CREATED_AT_COL, ID_COL, POINTS_COL, TITLE_COL, URL_COL, HNStats,
+    classify_title, print_top_hours, read_posts, stream_stats,
+)
+from hn_timezones import SOURCE_ZONE
+
+CONCURRENCY = 32
+POOL_SIZE = 8
+QUEUE_SIZE = 1000
+
+
+async def http_get(reader, writer, host, path):
+    """Send one GET on an open connection and read the whole response.
+
+    Returns:
+        tuple (int, bytes, bool): Status, body and whether the connection
+        can be reused.
+    """
+    writer.write(
+        'GET {} HTTP/1.1\r\nHost: {}\r\nAccept: application/json\r\n\r\n'.format(path, host)
+        .encode('ascii')
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('connection closed by {}'.format(host))
+    version, status = status_line.split()[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    keep_alive = version == b'HTTP/1.1' and headers.get('connection') != 'close'
+    if headers.get('transfer-encoding') == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                while await reader.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return int(status), body, keep_alive
+
+
+class ConnectionPool:
+    """At most `size` keep-alive connections to one host, opened on demand.
+
+    Args:
+        base_url (str): e.g. 'https://hacker-news.firebaseio.com' or
+            'http://127.0.0.1:8000'.
+        size (int): Maximum number of open connections.
+    """
+
+    def __init__(self, base_url, size=POOL_SIZE):
+        url = urlsplit(base_url)
+        self.ssl = url.scheme == 'https'
+        self.host = url.hostname
+        self.port = url.port or (443 if self.ssl else 80)
+        self.prefix = url.path.rstrip('/')
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []
+
+    async def get_json(self, path):
+        """GET `path` and decode the json body.
+
+        A reused connection the server has closed in the meantime is
+        replaced once before giving up.
+        """
+        async with self.slots:
+            for attempt in range(2):
+                if self.idle:
+                    reader, writer = self.idle.pop()
+                else:
+                    reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+                try:
+                    status, body, keep_alive = await http_get(reader, writer, self.host, self.prefix + path)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if attempt:
+                        raise
+                    continue
+                except BaseException:
+                    # the connection is in an unknown state, don't put it back
+                    writer.close()
+                    raise
+                if keep_alive:
+                    self.idle.append((reader, writer))
+                else:
+                    writer.close()
+                break
+        if status != 200:
+            raise RuntimeError('GET {} returned {}'.format(path, status))
+        return json.loads(body)
+
+    def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
+
+
+def item_to_row(item, zone):
+    """Turn an API item into a `hacker_news.csv` row, or None if it is no story.
+
+    `created_at` is written in the dump's `%m/%d/%Y %H:%M` layout in `zone`.
+    """
+    if not item or item.get('type') != 'story' or item.get('deleted') or item.get('dead'):
+        return None
+    created = dt.datetime.fromtimestamp(item['time'], zone)
+    row = [''] * 7
+    row[ID_COL] = str(item['id'])
+    row[TITLE_COL] = item.get('title', '')
+    row[URL_COL] = item.get('url', '')
+    row[POINTS_COL] = str(item.get('score') or 0)
+    row[COMMENTS_COL] = str(item.get('descendants') or 0)
+    row[AUTHOR_COL] = item.get('by', '')
+    row[CREATED_AT_COL] = '{}/{}/{} {}:{:02d}'.format(
+        created.month, created.day, created.year, created.hour, created.minute)
+    return row
+
+
+async def fetch_stats(base_url, ids=None, limit=10000, concurrency=CONCURRENCY,
+                      pool_size=POOL_SIZE, queue_size=QUEUE_SIZE, classify=classify_title,
+                      zone=SOURCE_ZONE):
+    """Fetch items from the API and aggregate them as they arrive.
+
+    Args:
+        base_url (str): Root of the API service, without `/v0`.
+        ids (iterable of int): Item ids to fetch. By default the `limit`
+            most recent ones, counted down from `/v0/maxitem.json`.
+        limit (int): Number of recent items when `ids` is not given.
+        concurrency (int): Maximum number of requests in flight.
+        pool_size (int): Maximum number of open connections.
+        queue_size (int): Rows waiting for aggregation before fetching pauses.
+        classify (function): Maps a title to its post type.
+        zone (str): Zone `created_at` is written in, the dump's by default.
+
+    Returns:
+        HNStats: Totals, averages and per-hour tables of the fetched stories.
+    """
+    pool = ConnectionPool(base_url, pool_size)
+    zone = ZoneInfo(zone)
+    queue = asyncio.Queue(maxsize=queue_size)
+    stats = HNStats()
+    try:
+        if ids is None:
+            max_id = await pool.get_json('/v0/maxitem.json')
+            ids = range(max_id, max(max_id - limit, 0), -1)
+        ids = iter(ids)
+
+        async def fetch():
+            for item_id in ids:
+                row = item_to_row(await pool.get_json('/v0/item/{}.json'.format(item_id)), zone)
+                if row is not None:
+                    await queue.put(row)
+
+        async def aggregate():
+            while True:
+                row = await queue.get()
+                if row is None:
+                    return
+                stats.add(classify(row[TITLE_COL]), row)
+
+        consumer = asyncio.ensure_future(aggregate())
+        fetchers = [asyncio.ensure_future(fetch()) for _ in range(concurrency)]
+        fetching = asyncio.gather(*fetchers)
+        tasks = fetchers + [consumer]
+        try:
+            # the consumer is watched too: if it fails, the fetchers would
+            # otherwise wait on the full queue forever
+            done, pending = await asyncio.wait([fetching, consumer], return_when=asyncio.FIRST_COMPLETED)
+            if consumer in done:
+                consumer.result()
+            fetching.result()
+            await queue.put(None)
+            await consumer
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(fetching, *tasks, return_exceptions=True)
+            raise
+    finally:
+        pool.close()
+    return stats
+
+
+def row_to_item(row, zone):
+    """Turn a `hacker_news.csv` row into an API story item."""
+    created = dt.datetime.strptime(row[CREATED_AT_COL], "%m/%d/%Y %H:%M").replace(tzinfo=zone)
+    return {
+        'id': int(row[ID_COL]), 'type': 'story', 'title': row[TITLE_COL], 'url': row[URL_COL],
+        'score': int(row[POINTS_COL]), 'descendants': int(row[COMMENTS_COL]),
+        'by': row[AUTHOR_COL], 'time': int(created.timestamp()),
+    }
+
+
+def serve_items(items, host='127.0.0.1', port=0):
+    """Start a local stand-in of the item API in a background thread.
+
+    Args:
+        items (dict): Maps item ids to the json objects to serve.
+        host (str): Interface to listen on.
+        port (int): Port to listen on, any free one by default.
+
+    Returns:
+        ThreadingHTTPServer: Call `shutdown()` to stop it. The root url is
+        'http://{}:{}'.format(*server.server_address).
+    """
+    max_id = max(items, default=0)
+
+    class ItemHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body go out in separate writes, Nagle would hold the body back
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if self.path == '/v0/maxitem.json':
+                body = max_id
+            elif self.path.startswith('/v0/item/') and self.path.endswith('.json'):
+                body = items.get(int(self.path[len('/v0/item/'):-len('.json')]))
+            else:
+                self.send_error(404)
+                return
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), ItemHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('base_url', nargs='?', default='https://hacker-news.firebaseio.com')
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE)
+    parser.add_argument('--local', metavar='CSV',
+                        help='serve the rows of CSV locally and fetch them from there')
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.base_url
+    limit = args.limit
+    if args.local:
+        zone = ZoneInfo(SOURCE_ZONE)
+        items = {}
+        for row in read_posts(args.local):
+            item = row_to_item(row, zone)
+            items[item['id']] = item
+        server = serve_items(items)
+        base_url = 'http://{}:{}'.format(*server.server_address)
+        limit = max(items) - min(items) + 1
+    try:
+        stats = asyncio.run(fetch_stats(
+            base_url, limit=limit, concurrency=args.concurrency, pool_size=args.pool_size))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(stats.avg_ask_comments)
+    print(stats.avg_show_comments)
+    print_top_hours(stats.sorted_swap())
+    if args.local:
+        expected = stream_stats(args.local)
+        print("matches hn_stream: {}".format(
+            stats.sorted_swap() == expected.sorted_swap()
+            and stats.avg_show_comments == expected.avg_show_comments))
+
+
+if __name__ == '__main__':
+    main()
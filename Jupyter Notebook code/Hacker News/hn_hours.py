@@ -0,0 +1,121 @@
+"""Vectorized hour bucketing for the Ask HN per-hour averages.
+
+The notebook calls `dt.datetime.strptime(date, date_format).strftime("%H")`
+on every Ask HN post and then counts through dicts keyed by hour strings.
+`created_at` always has the fixed `%m/%d/%Y %H:%M` layout, so the hour can be
+sliced straight out of the string into an integer NumPy array, and the
+per-hour sums and counts become two `np.bincount` calls.
+"""
+import datetime as dt
+import timeit
+
+import numpy as np
+
+from hn_stream import COMMENTS_COL, CREATED_AT_COL, DATE_FORMAT, classify_posts, read_posts
+
+HOURS = 24
+
+
+def parse_hour(date):
+    """Return the hour of a `%m/%d/%Y %H:%M` timestamp as an int.
+
+    The minutes are always two digits, so the hour sits between the space
+    and the last three characters.
+    """
+    return int(date[date.index(' ') + 1:-3])
+
+
+def parse_hours(dates):
+    """Parse an iterable of `created_at` strings into an int8 array of hours."""
+    return np.fromiter((parse_hour(date) for date in dates), dtype=np.int8)
+
+
+def hour_tables(hours, comments):
+    """Bucket comments by hour.
+
+    Args:
+        hours (numpy array of int): Hour each post was created at, 0-23.
+        comments (numpy array of int): Number of comments of each post.
+
+    Returns:
+        tuple (numpy array, numpy array, numpy array): `comments_by_hour`,
+        `counts_by_hour` and `avg_by_hour`, indexed by hour. Hours without
+        any post have an average of NaN.
+    """
+    hours = np.asarray(hours, dtype=np.intp)
+    counts_by_hour = np.bincount(hours, minlength=HOURS)
+    comments_by_hour = np.bincount(hours, weights=comments, minlength=HOURS).astype(np.int64)
+    avg_by_hour = np.full(HOURS, np.nan)
+    np.divide(comments_by_hour, counts_by_hour, out=avg_by_hour, where=counts_by_hour > 0)
+    return comments_by_hour, counts_by_hour, avg_by_hour
+
+
+def sorted_hours(avg_by_hour):
+    """Return `(hours, averages)` arrays sorted from the busiest hour down.
+
+    Ties are broken by the later hour first, like `sorted(swap_avg_by_hour,
+    reverse=True)` in the notebook. Hours without posts are left out.
+    """
+    hours = np.flatnonzero(~np.isnan(avg_by_hour))
+    order = np.lexsort((hours, avg_by_hour[hours]))[::-1]
+    return hours[order], avg_by_hour[hours][order]
+
+
+def read_ask_posts(path):
+    """Return the `created_at` strings and comment counts of the Ask HN posts."""
+    dates = []
+    comments = []
+    for post_type, row in classify_posts(read_posts(path)):
+        if post_type == 'ask':
+            dates.append(row[CREATED_AT_COL])
+            comments.append(int(row[COMMENTS_COL]))
+    return dates, comments
+
+
+def ask_hour_arrays(path):
+    """Return the `(hours, comments)` arrays of every Ask HN post in `path`."""
+    dates, comments = read_ask_posts(path)
+    return parse_hours(dates), np.array(comments, dtype=np.int64)
+
+
+def loop_hour_tables(dates, comments):
+    """The notebook's strptime and dict loop, kept as the benchmark baseline."""
+    comments_by_hour = {}
+    counts_by_hour = {}
+    for date, comment in zip(dates, comments):
+        time = dt.datetime.strptime(date, DATE_FORMAT).strftime("%H")
+        if time in counts_by_hour:
+            comments_by_hour[time] += comment
+            counts_by_hour[time] += 1
+        else:
+            comments_by_hour[time] = comment
+            counts_by_hour[time] = 1
+    return comments_by_hour, counts_by_hour
+
+
+def benchmark(dates, comments, number=3):
+    """Time the notebook loop against the vectorized version.
+
+    Args:
+        dates (list of str): `created_at` values of the Ask HN posts.
+        comments (list of int): Number of comments of each post.
+        number (int): How many runs to take the best time from.
+
+    Returns:
+        dict: Best time in seconds for 'loop' and 'vectorized'.
+    """
+    comment_array = np.asarray(comments, dtype=np.int64)
+    loop = timeit.repeat(lambda: loop_hour_tables(dates, comments), number=1, repeat=number)
+    vectorized = timeit.repeat(
+        lambda: hour_tables(parse_hours(dates), comment_array), number=1, repeat=number
+    )
+    return {'loop': min(loop), 'vectorized': min(vectorized)}
+
+
+if __name__ == '__main__':
+    dates, comments = read_ask_posts("hacker_news.csv")
+    timings = benchmark(dates, comments)
+    print("{} Ask HN posts".format(len(dates)))
+    print("strptime loop: {:.4f}s".format(timings['loop']))
+    print("vectorized:    {:.4f}s ({:.1f}x)".format(
+        timings['vectorized'], timings['loop'] / timings['vectorized']))
@@ -0,0 +1,148 @@
+"""Multi-process version of the Hacker News analysis.
+
+`hacker_news.csv` is cut into equal byte ranges, and a newline only ends a
+record when it is outside a quoted field. The analysis runs in two
+parallel passes so that no worker waits on a serial scan of the file:
+
+1. every worker counts the parity of the `"` characters in its range
+   (an escaped quote `""` counts twice and leaves the parity unchanged),
+2. the parent turns those into the parity at the start of each range with
+   a prefix XOR, and every worker moves both ends of its range forward to
+   the next unquoted newline, then streams the records in between into an
+   `HNStats`.
+
+Neighbouring ranges align the shared end the same way, so every record,
+titles with embedded newlines included, is read by exactly one worker.
+The partial totals are merged back together, so `avg_ask_comments`,
+`avg_show_comments` and `sorted_swap` come out the same as a single pass.
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from operator import xor
+
+from hn_stream import HNStats, classify_posts, print_top_hours
+
+BLOCK_SIZE = 1 << 20
+
+
+def quote_parity(path, start, end, block_size=BLOCK_SIZE):
+    """Parity of the number of `"` between byte offsets `start` and `end`."""
+    parity = 0
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(block_size, remaining))
+            if not block:
+                break
+            parity ^= block.count(b'"') & 1
+            remaining -= len(block)
+    return parity
+
+
+def next_record(file, offset, quoted, block_size=BLOCK_SIZE):
+    """Offset just past the first unquoted newline at or after `offset`.
+
+    Args:
+        file (file object): The csv file, opened in binary mode.
+        offset (int): Where to start looking.
+        quoted (int): Parity of the `"` before `offset`, 1 inside a quoted
+            field.
+        block_size (int): Number of bytes read at a time.
+
+    Returns:
+        int: Start of the next record, or the end of the file.
+    """
+    file.seek(offset)
+    pos = offset
+    while True:
+        block = file.read(block_size)
+        if not block:
+            return pos
+        i = 0
+        while True:
+            nl = block.find(b'\n', i)
+            if nl == -1:
+                break
+            quoted ^= block.count(b'"', i, nl) & 1
+            if not quoted:
+                return pos + nl + 1
+            i = nl + 1
+        quoted ^= block.count(b'"', i) & 1
+        pos += len(block)
+
+
+def byte_ranges(path, shards):
+    """Split `path` into `shards` equal `(start, end)` byte ranges, unaligned."""
+    size = os.path.getsize(path)
+    cuts = [size * i // shards for i in range(shards + 1)]
+    return [(start, end) for start, end in zip(cuts, cuts[1:]) if start < end]
+
+
+def read_range(path, start, end):
+    """Yield the decoded lines of `path` between byte offsets `start` and `end`."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start
+        for line in file:
+            if remaining <= 0:
+                break
+            remaining -= len(line)
+            yield line.decode('utf-8')
+
+
+def aggregate_range(path, start, end, start_quoted, end_quoted):
+    """Compute the partial `HNStats` of one byte range. Runs in a worker process.
+
+    The range is first moved to record boundaries: it runs from the next
+    unquoted newline at or after `start` to the one at or after `end`, so
+    the header row, which ends before the first newline, is left out.
+    """
+    with open(path, 'rb') as file:
+        first = next_record(file, start, start_quoted)
+        last = next_record(file, end, end_quoted)
+    stats = HNStats()
+    if first >= last:
+        return stats
+    for post_type, row in classify_posts(csv.reader(read_range(path, first, last))):
+        stats.add(post_type, row)
+    return stats
+
+
+def parallel_stats(path, workers=None, shards=None):
+    """Compute the notebook's statistics over `path` with several processes.
+
+    Args:
+        path (str): Location of the Hacker News csv dump.
+        workers (int): Number of worker processes, all cores by default.
+        shards (int): Number of byte ranges, four per worker by default so a
+            slow range does not leave the other cores idle.
+
+    Returns:
+        HNStats: The merged totals of every shard.
+    """
+    workers = workers or os.cpu_count()
+    shards = shards or workers * 4
+    ranges = byte_ranges(path, shards)
+    stats = HNStats()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parities = list(executor.map(quote_parity, *zip(*[(path, start, end) for start, end in ranges])))
+        # parity of the quotes before each range, and before the end of the file
+        quoted = list(accumulate([0] + parities, xor))
+        futures = [executor.submit(aggregate_range, path, start, end, quoted[i], quoted[i + 1])
+                   for i, (start, end) in enumerate(ranges)]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+
+if __name__ == '__main__':
+    stats = parallel_stats("hacker_news.csv")
+    avg_ask_comments = stats.avg_ask_comments
+    avg_show_comments = stats.avg_show_comments
+    sorted_swap = stats.sorted_swap()
+    print(avg_ask_comments)
+    print(avg_show_comments)
+    print_top_hours(sorted_swap)
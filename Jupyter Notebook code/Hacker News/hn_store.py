@@ -0,0 +1,140 @@
+"""Persisted partial aggregates for daily Hacker News dumps.
+
+Instead of rerunning the analysis over all history every day, `HNStore`
+keeps the sum of comments and the number of posts per post type, day and
+hour in a SQLite file. Ingesting a new dump only folds in the rows whose
+post id has not been seen before, and the Ask/Show averages and
+`avg_by_hour` are then read back from the small aggregate table.
+"""
+import sqlite3
+import sys
+
+from hn_stream import COMMENTS_COL, CREATED_AT_COL, ID_COL, HNStats, classify_posts, read_posts
+
+BATCH_SIZE = 50000
+
+SCHEMA = '''
+create table if not exists seen_posts (
+    id integer primary key
+);
+create table if not exists post_aggregates (
+    post_type text not null,
+    day text not null,
+    hour integer not null,
+    comments integer not null,
+    posts integer not null,
+    primary key (post_type, day, hour)
+) without rowid;
+'''
+
+
+def parse_day_hour(date):
+    """Split a `%m/%d/%Y %H:%M` timestamp into an ISO day and an int hour."""
+    day, time = date.split(' ')
+    month, mday, year = day.split('/')
+    return '{}-{:0>2}-{:0>2}'.format(year, month, mday), int(time.split(':')[0])
+
+
+class HNStore:
+    """Incremental store of per type, day and hour comment totals.
+
+    Args:
+        path (str): Location of the SQLite file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def ingest(self, csv_path, batch_size=BATCH_SIZE):
+        """Fold the posts of a dump that are not in the store yet.
+
+        Rows are staged in batches in a temporary table, posts whose id was
+        already ingested (or repeats within the same file) are dropped, and
+        the rest are added to the aggregates with an upsert.
+
+        Args:
+            csv_path (str): Location of the Hacker News csv dump.
+            batch_size (int): Number of rows staged per statement.
+
+        Returns:
+            int: Number of new posts added to the store.
+        """
+        conn = self.conn
+        with conn:
+            conn.execute('''create temp table if not exists staged_posts (
+                id integer primary key, post_type text, day text, hour integer, comments integer
+            )''')
+            conn.execute('delete from staged_posts')
+            batch = []
+            for post_type, row in classify_posts(read_posts(csv_path)):
+                day, hour = parse_day_hour(row[CREATED_AT_COL])
+                batch.append((int(row[ID_COL]), post_type, day, hour, int(row[COMMENTS_COL])))
+                if len(batch) >= batch_size:
+                    self._stage(batch)
+                    batch = []
+            self._stage(batch)
+            conn.execute('''delete from staged_posts
+                where id in (select id from seen_posts)''')
+            added = conn.execute('select count(*) from staged_posts').fetchone()[0]
+            # `where true` keeps SQLite from reading `on conflict` as a join clause
+            conn.execute('''insert into post_aggregates (post_type, day, hour, comments, posts)
+                select post_type, day, hour, sum(comments), count(*)
+                from staged_posts where true
+                group by post_type, day, hour
+                on conflict (post_type, day, hour) do update set
+                    comments = comments + excluded.comments,
+                    posts = posts + excluded.posts''')
+            conn.execute('insert into seen_posts (id) select id from staged_posts')
+            conn.execute('delete from staged_posts')
+        return added
+
+    def _stage(self, batch):
+        self.conn.executemany(
+            'insert or ignore into staged_posts values (?, ?, ?, ?, ?)', batch
+        )
+
+    def stats(self, first_day=None, last_day=None):
+        """Rebuild the notebook's statistics from the stored aggregates.
+
+        Args:
+            first_day (str): Optional ISO day to start from, inclusive.
+            last_day (str): Optional ISO day to stop at, inclusive.
+
+        Returns:
+            HNStats: Ask/Show totals and the Ask HN per-hour tables.
+        """
+        stats = HNStats()
+        query = '''select post_type, hour, sum(comments), sum(posts) from post_aggregates
+            where day >= ? and day <= ? group by post_type, hour'''
+        rows = self.conn.execute(query, (first_day or '', last_day or '9999-12-31'))
+        for post_type, hour, comments, posts in rows:
+            if post_type == 'ask':
+                stats.total_ask_comments += comments
+                stats.ask_count += posts
+                stats.add_hour('{:02d}'.format(hour), comments, posts)
+            elif post_type == 'show':
+                stats.total_show_comments += comments
+                stats.show_count += posts
+            else:
+                stats.other_count += posts
+        return stats
+
+
+if __name__ == '__main__':
+    with HNStore("hacker_news.db") as store:
+        for csv_path in sys.argv[1:]:
+            print("{}: {} new posts".format(csv_path, store.ingest(csv_path)))
+        stats = store.stats()
+        print(stats.avg_ask_comments)
+        print(stats.avg_show_comments)
+        print(stats.avg_by_hour())
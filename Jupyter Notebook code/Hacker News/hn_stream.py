@@ -0,0 +1,161 @@
+"""Single-pass, constant-memory version of the Hacker News analysis.
+
+`HackerNews.py` loads the whole dump into memory and copies every row into
+`ask_posts`, `show_posts` or `other_posts` before summing anything. The
+helpers here stream the rows through a generator instead, so the Ask/Show
+averages and the per-hour tables are filled in a single pass over the file.
+"""
+import csv
+import datetime as dt
+
+DATE_FORMAT = "%m/%d/%Y %H:%M"
+
+ID_COL = 0
+TITLE_COL = 1
+URL_COL = 2
+POINTS_COL = 3
+COMMENTS_COL = 4
+AUTHOR_COL = 5
+CREATED_AT_COL = 6
+
+
+def read_posts(path):
+    """Yield the data rows of a Hacker News csv dump, skipping the header.
+
+    Args:
+        path (str): Location of the csv file.
+
+    Yields:
+        list of str: One row of the dump at a time.
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for row in reader:
+            yield row
+
+
+def classify_title(title):
+    """Return the post type of `title`: 'ask', 'show' or 'other'."""
+    title = title.lower()
+    if title.startswith('ask hn'):
+        return 'ask'
+    elif title.startswith('show hn'):
+        return 'show'
+    return 'other'
+
+
+def classify_posts(rows, classify=classify_title):
+    """Yield `(post_type, row)` pairs for every row in `rows`.
+
+    Args:
+        rows (iterable of list): Rows of a Hacker News dump, without header.
+        classify (function): Maps a title to its post type, e.g. a
+            `hn_classify.PrefixClassifier`.
+    """
+    for row in rows:
+        yield classify(row[TITLE_COL]), row
+
+
+class HNStats:
+    """Running totals needed for the Ask/Show and per-hour averages.
+
+    Only sums and counts are kept, so memory does not grow with the number
+    of posts. `comments_by_hour` and `counts_by_hour` are keyed by the
+    zero-padded hour string, exactly like the notebook.
+    """
+
+    def __init__(self):
+        self.total_ask_comments = 0
+        self.total_show_comments = 0
+        self.ask_count = 0
+        self.show_count = 0
+        self.other_count = 0
+        self.comments_by_hour = {}
+        self.counts_by_hour = {}
+
+    def add(self, post_type, row):
+        """Fold a single classified row into the totals."""
+        if post_type == 'ask':
+            comment = int(row[COMMENTS_COL])
+            self.total_ask_comments += comment
+            self.ask_count += 1
+            time = dt.datetime.strptime(row[CREATED_AT_COL], DATE_FORMAT).strftime("%H")
+            self.add_hour(time, comment)
+        elif post_type == 'show':
+            self.total_show_comments += int(row[COMMENTS_COL])
+            self.show_count += 1
+        else:
+            self.other_count += 1
+
+    def add_hour(self, time, comment, count=1):
+        """Add `count` Ask HN posts with `comment` comments to hour `time`."""
+        if time in self.counts_by_hour:
+            self.comments_by_hour[time] += comment
+            self.counts_by_hour[time] += count
+        else:
+            self.comments_by_hour[time] = comment
+            self.counts_by_hour[time] = count
+
+    def merge(self, other):
+        """Fold the totals of another `HNStats` into this one and return self."""
+        self.total_ask_comments += other.total_ask_comments
+        self.total_show_comments += other.total_show_comments
+        self.ask_count += other.ask_count
+        self.show_count += other.show_count
+        self.other_count += other.other_count
+        for time in other.counts_by_hour:
+            self.add_hour(time, other.comments_by_hour[time], other.counts_by_hour[time])
+        return self
+
+    @property
+    def avg_ask_comments(self):
+        return self.total_ask_comments / self.ask_count
+
+    @property
+    def avg_show_comments(self):
+        return self.total_show_comments / self.show_count
+
+    def avg_by_hour(self):
+        """Return `[hour, average comments]` pairs, as built in the notebook."""
+        avg_by_hour = []
+        for hr in self.comments_by_hour:
+            avg_by_hour.append([hr, self.comments_by_hour[hr] / self.counts_by_hour[hr]])
+        return avg_by_hour
+
+    def sorted_swap(self):
+        """Return `[average, hour]` pairs sorted from the busiest hour down."""
+        return sorted([[avg, hr] for hr, avg in self.avg_by_hour()], reverse=True)
+
+
+def stream_stats(path):
+    """Compute the notebook's statistics in one pass over `path`.
+
+    Args:
+        path (str): Location of the Hacker News csv dump.
+
+    Returns:
+        HNStats: Totals, averages and per-hour tables for the whole file.
+    """
+    stats = HNStats()
+    for post_type, row in classify_posts(read_posts(path)):
+        stats.add(post_type, row)
+    return stats
+
+
+def print_top_hours(sorted_swap, n=5):
+    """Print the `n` hours with the highest average comments per post."""
+    print("Top {} Hours for 'Ask HN' Comments".format(n))
+    for avg, hr in sorted_swap[:n]:
+        print(
+            "{}: {:.2f} average comments per post".format(
+                dt.datetime.strptime(hr, "%H").strftime("%H:%M"), avg
+            )
+        )
+
+
+if __name__ == '__main__':
+    stats = stream_stats("hacker_news.csv")
+    print(stats.avg_ask_comments)
+    print(stats.avg_show_comments)
+    print_top_hours(stats.sorted_swap())
@@ -0,0 +1,118 @@
+"""Ask HN hourly averages broken down by time zone.
+
+Converting every `created_at` with tzinfo is far too slow at our volumes.
+Instead the UTC offset of each zone is looked up once per epoch hour over
+the span of the data, DST transitions included, and the timestamps are
+shifted with vectorized gathers into those tables. The per-zone hourly
+sums and counts then come from an `np.bincount` of the local hours, one
+zone at a time, so memory stays at a few arrays of the input's length
+whatever the number of zones.
+
+Timestamps are minutes since the epoch as stored by `hn_columns`, in the
+wall-clock time of `source_zone`.
+"""
+import datetime as dt
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from hn_columns import open_cache
+from hn_hours import HOURS, sorted_hours
+
+SOURCE_ZONE = 'America/New_York'
+
+EPOCH = dt.datetime(1970, 1, 1)
+
+
+def offset_table(zone, first_hour, last_hour):
+    """UTC offset of `zone`, in minutes, for every UTC epoch hour in a range.
+
+    Offsets are sampled at the start of each UTC hour, which is exact for
+    every zone whose transitions happen on the hour, i.e. all but a few
+    such as Australia/Lord_Howe.
+
+    Args:
+        zone (str): IANA name of the zone.
+        first_hour (int): First UTC hour since the epoch, inclusive.
+        last_hour (int): Last UTC hour since the epoch, inclusive.
+
+    Returns:
+        numpy array of int32: Offset for `first_hour + i` at index `i`.
+    """
+    tz = ZoneInfo(zone)
+    utc = dt.timezone.utc
+    return np.array([
+        dt.datetime.fromtimestamp(hour * 3600, utc).astimezone(tz).utcoffset() // dt.timedelta(minutes=1)
+        for hour in range(first_hour, last_hour + 1)
+    ], dtype=np.int32)
+
+
+def local_offset_table(zone, first_hour, last_hour):
+    """UTC offset of `zone` for every local wall-clock hour in a range.
+
+    Used to turn wall-clock timestamps back into UTC. Hours that happen
+    twice when DST ends take their first offset, and hours skipped when it
+    starts take the offset from before the change, like `fold=0`.
+    """
+    tz = ZoneInfo(zone)
+    return np.array([
+        (EPOCH + dt.timedelta(hours=hour)).replace(tzinfo=tz).utcoffset() // dt.timedelta(minutes=1)
+        for hour in range(first_hour, last_hour + 1)
+    ], dtype=np.int32)
+
+
+def to_utc(local_minutes, zone):
+    """Convert wall-clock minutes since the epoch in `zone` to UTC minutes."""
+    local_minutes = np.asarray(local_minutes, dtype=np.int64)
+    local_hours = local_minutes // 60
+    first, last = int(local_hours.min()), int(local_hours.max())
+    table = local_offset_table(zone, first, last)
+    return local_minutes - table[local_hours - first]
+
+
+def hourly_by_zone(created_at, comments, zones, source_zone=SOURCE_ZONE):
+    """Per-hour comment tables of the same posts in several time zones.
+
+    Args:
+        created_at (numpy array of int): Minutes since the epoch, in the
+            wall-clock time of `source_zone`.
+        comments (numpy array of int): Number of comments of each post.
+        zones (list of str): IANA names of the zones to report.
+        source_zone (str): Zone `created_at` was recorded in.
+
+    Returns:
+        dict: Maps each zone to its `comments_by_hour`, `counts_by_hour` and
+        `avg_by_hour` arrays, as returned by `hn_hours.hour_tables`.
+    """
+    if len(created_at) == 0:
+        empty = np.zeros(HOURS, dtype=np.int64)
+        return {zone: (empty, empty, np.full(HOURS, np.nan)) for zone in zones}
+    utc = to_utc(created_at, source_zone)
+    utc_hours = utc // 60
+    first = int(utc_hours.min())
+    last = int(utc_hours.max())
+    index = utc_hours - first
+
+    weights = np.asarray(comments, dtype=np.float64)
+    counts = np.empty((len(zones), HOURS), dtype=np.int64)
+    sums = np.empty((len(zones), HOURS), dtype=np.int64)
+    for z, zone in enumerate(zones):
+        local = utc + offset_table(zone, first, last)[index]
+        hours = (local % 1440) // 60
+        counts[z] = np.bincount(hours, minlength=HOURS)
+        sums[z] = np.bincount(hours, weights=weights, minlength=HOURS)
+    avgs = np.full(counts.shape, np.nan)
+    np.divide(sums, counts, out=avgs, where=counts > 0)
+    return {zone: (sums[z], counts[z], avgs[z]) for z, zone in enumerate(zones)}
+
+
+if __name__ == '__main__':
+    zones = ['America/New_York', 'America/Los_Angeles', 'UTC', 'Europe/Berlin', 'Asia/Kolkata']
+    columns = open_cache("hacker_news.csv")
+    mask = columns.post_type == columns.code('ask')
+    tables = hourly_by_zone(columns.created_at[mask], columns.num_comments[mask], zones)
+    for zone, (comments_by_hour, counts_by_hour, avg_by_hour) in tables.items():
+        top_hours, top_avgs = sorted_hours(avg_by_hour)
+        print("Top 5 Hours for 'Ask HN' Comments in {}".format(zone))
+        for hr, avg in zip(top_hours[:5], top_avgs[:5]):
+            print("{:02d}:00: {:.2f} average comments per post".format(hr, avg))
@@ -0,0 +1,159 @@
+"""Streaming top-k rankings over Hacker News posts.
+
+`HackerNews.py` builds `swap_avg_by_hour`, sorts all of it and slices `[:5]`.
+That is fine for 24 hours but not for keys with millions of distinct values
+such as authors or URL domains. The rankings here are fed one row at a time
+and only ever select the best `k` entries with a bounded heap:
+
+* `TopValues` keeps the `k` largest raw values, e.g. top posts by points.
+  Memory is bounded by `k`.
+* `TopAverages` keeps a running sum and count per key and picks the `k`
+  best averages among keys with at least `min_count` posts. The sums have
+  to be kept per key to be exact, but the key space is never sorted.
+"""
+import heapq
+from urllib.parse import urlsplit
+
+from hn_store import parse_day_hour
+from hn_stream import (
+    AUTHOR_COL, COMMENTS_COL, CREATED_AT_COL, POINTS_COL, TITLE_COL, URL_COL, classify_posts,
+    read_posts,
+)
+
+
+def title(row):
+    return row[TITLE_COL]
+
+
+def author(row):
+    return row[AUTHOR_COL]
+
+
+def url_domain(row):
+    """Return the host of the post's url without `www.`, or None for text posts."""
+    netloc = urlsplit(row[URL_COL]).netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    return netloc or None
+
+
+def hour(row):
+    """Return the zero-padded hour the post was created at, like the notebook."""
+    return '{:02d}'.format(parse_day_hour(row[CREATED_AT_COL])[1])
+
+
+def day_hour(row):
+    """Return the `(ISO day, hour)` pair the post was created at."""
+    return parse_day_hour(row[CREATED_AT_COL])
+
+
+def num_comments(row):
+    return int(row[COMMENTS_COL])
+
+
+def num_points(row):
+    return int(row[POINTS_COL])
+
+
+class TopValues:
+    """The `k` rows with the largest raw value.
+
+    Args:
+        k (int): Number of entries to keep.
+        value (function): Returns the value to rank a row by.
+        key (function): Returns what identifies a row in the result.
+        post_types (set of str): Only rank these post types, all by default.
+    """
+
+    def __init__(self, k, value, key=title, post_types=None):
+        self.k = k
+        self.value = value
+        self.key = key
+        self.post_types = post_types
+        self.heap = []
+
+    def add(self, post_type, row):
+        if self.post_types and post_type not in self.post_types:
+            return
+        item = (self.value(row), self.key(row))
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def result(self):
+        """Return `(value, key)` pairs from the largest value down."""
+        return sorted(self.heap, reverse=True)
+
+
+class TopAverages:
+    """The `k` keys with the highest average value per post.
+
+    Args:
+        k (int): Number of entries to keep.
+        value (function): Returns the value to average for a row.
+        key (function): Returns the group of a row, or None to skip it.
+        min_count (int): Leave out keys with fewer posts than this.
+        post_types (set of str): Only rank these post types, all by default.
+    """
+
+    def __init__(self, k, value, key, min_count=1, post_types=None):
+        self.k = k
+        self.value = value
+        self.key = key
+        self.min_count = min_count
+        self.post_types = post_types
+        self.sums = {}
+        self.counts = {}
+
+    def add(self, post_type, row):
+        if self.post_types and post_type not in self.post_types:
+            return
+        key = self.key(row)
+        if key is None:
+            return
+        self.sums[key] = self.sums.get(key, 0) + self.value(row)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def result(self):
+        """Return `(average, key)` pairs from the highest average down."""
+        return heapq.nlargest(
+            self.k,
+            (
+                (self.sums[key] / count, key)
+                for key, count in self.counts.items()
+                if count >= self.min_count
+            ),
+        )
+
+
+def rank_posts(rows, rankings):
+    """Feed every row to every ranking in a single pass.
+
+    Args:
+        rows (iterable of list): Rows of a Hacker News dump, without header.
+        rankings (dict): Maps a name to a `TopValues` or `TopAverages`.
+
+    Returns:
+        dict: Maps each name to the result of its ranking.
+    """
+    rankings = dict(rankings)
+    for post_type, row in classify_posts(rows):
+        for ranking in rankings.values():
+            ranking.add(post_type, row)
+    return {name: ranking.result() for name, ranking in rankings.items()}
+
+
+if __name__ == '__main__':
+    results = rank_posts(read_posts("hacker_news.csv"), {
+        "Top 5 Hours for 'Ask HN' Comments": TopAverages(5, num_comments, hour, post_types={'ask'}),
+        "Top 10 Authors by Average Comments": TopAverages(10, num_comments, author, min_count=5),
+        "Top 10 Domains by Average Points": TopAverages(10, num_points, url_domain, min_count=5),
+        "Top 10 Day-Hours by Average Comments": TopAverages(10, num_comments, day_hour, min_count=3),
+        "Top 10 Posts by Points": TopValues(10, num_points),
+        "Top 10 Posts by Comments": TopValues(10, num_comments),
+    })
+    for name, result in results.items():
+        print(name)
+        for value, key in result:
+            print("    {}: {:.2f}".format(key, value))
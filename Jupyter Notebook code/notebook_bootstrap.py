@@ -0,0 +1,209 @@
+"""Run the exported notebook scripts as plain, headless Python scripts.
+
+The `.py` exports call `get_ipython().magic('matplotlib inline')`, which
+only exists inside IPython, and import `matplotlib.pyplot` (and sometimes
+`seaborn`) up front, which costs about a second even for scripts, or runs,
+that never draw anything. `install` prepares the interpreter for them:
+
+* `matplotlib.pyplot` and `seaborn` are imported lazily, through
+  `importlib.util.LazyLoader`, so `import matplotlib.pyplot as plt` is free
+  and the real import happens at the first `plt.figure()` or
+  `DataFrame.plot()`.
+* `get_ipython()` returns a shell whose magics do nothing, unless the
+  script really runs under IPython.
+* Without a display, the Agg backend is selected, so figures render to
+  files instead of failing to open a window.
+
+Run a script with it from the command line; the script runs from its own
+directory so its relative CSV paths resolve:
+
+    python notebook_bootstrap.py "CollageGraduates/collage_analysis.py" --figures out/
+    python notebook_bootstrap.py --import-time
+"""
+import argparse
+import builtins
+import importlib.abc
+import importlib.util
+import os
+import runpy
+import subprocess
+import sys
+import time
+import types
+
+LAZY_MODULES = ('matplotlib.pyplot', 'seaborn')
+
+EAGER_IMPORTS = 'import pandas as pd\nimport matplotlib.pyplot as plt\n'
+
+
+class LazyFinder(importlib.abc.MetaPathFinder):
+    """Meta path finder that gives `names` a `LazyLoader`.
+
+    The module object is created at import time, but its code only runs
+    when one of its attributes is first used.
+    """
+
+    def __init__(self, names=LAZY_MODULES):
+        self.names = set(names)
+
+    def find_spec(self, name, path, target=None):
+        if name not in self.names:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = importlib.util.LazyLoader(spec.loader)
+                return spec
+        return None
+
+
+class MagicShim:
+    """Stand-in for the IPython shell whose magics are no-ops.
+
+    `%matplotlib inline` has nothing to do outside a notebook: the backend
+    is already chosen by `install`.
+    """
+
+    def magic(self, line):
+        return None
+
+    def run_line_magic(self, name, line, *args, **kwargs):
+        return None
+
+    def run_cell_magic(self, name, line, cell):
+        return None
+
+    def system(self, cmd):
+        return None
+
+
+_shim = MagicShim()
+
+
+def get_ipython():
+    """Return the running IPython shell, or the no-op `MagicShim`."""
+    if 'IPython' in sys.modules:
+        shell = sys.modules['IPython'].get_ipython()
+        if shell is not None:
+            return shell
+    return _shim
+
+
+def is_headless():
+    """True on Linux and other X11 systems when no display is available."""
+    if sys.platform in ('win32', 'darwin'):
+        return False
+    return not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+
+def install(lazy=LAZY_MODULES, headless=None):
+    """Prepare this interpreter to run an exported notebook script.
+
+    Args:
+        lazy (tuple of str): Modules to import lazily. Modules already
+            imported stay as they are.
+        headless (bool): Force the Agg backend, or never force it. By
+            default Agg is used when `is_headless()` and no backend was set
+            with `MPLBACKEND`.
+    """
+    if headless is None:
+        headless = is_headless()
+    if headless:
+        os.environ.setdefault('MPLBACKEND', 'Agg')
+    if not any(isinstance(finder, LazyFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, LazyFinder(lazy))
+    if not hasattr(builtins, 'get_ipython'):
+        builtins.get_ipython = get_ipython
+
+
+def is_loaded(name):
+    """True if `name` was imported and, if lazy, has actually run."""
+    module = sys.modules.get(name)
+    return module is not None and type(module) is types.ModuleType
+
+
+def save_figures(directory, prefix='figure'):
+    """Save every open pyplot figure as `<prefix>_<n>.png` in `directory`.
+
+    Nothing is imported, and nothing saved, if the script never drew.
+
+    Returns:
+        list of str: The files written.
+    """
+    if not is_loaded('matplotlib.pyplot'):
+        return []
+    import matplotlib.pyplot as plt
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for number in plt.get_fignums():
+        path = os.path.join(directory, '{}_{}.png'.format(prefix, number))
+        plt.figure(number).savefig(path)
+        paths.append(path)
+    return paths
+
+
+def run_script(path, figures=None):
+    """Run an exported notebook from its own directory, bootstrapped.
+
+    Args:
+        path (str): The `.py` export.
+        figures (str): Directory to save the open figures to at the end.
+
+    Returns:
+        dict: The globals the script left behind.
+    """
+    install()
+    path = os.path.abspath(path)
+    figures = figures and os.path.abspath(figures)
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(path))
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        result = runpy.run_path(path, run_name='__main__')
+    finally:
+        sys.path.remove(os.path.dirname(path))
+        os.chdir(cwd)
+    if figures:
+        prefix = os.path.splitext(os.path.basename(path))[0]
+        for saved in save_figures(figures, prefix):
+            print(saved)
+    return result
+
+
+def import_time(code=EAGER_IMPORTS, bootstrap=False, repeat=5):
+    """Best time for a fresh interpreter to run `code`, in seconds.
+
+    The interpreter start-up itself is included, so compare the plain and
+    the bootstrapped runs with each other, not with zero.
+    """
+    if bootstrap:
+        code = 'import notebook_bootstrap\nnotebook_bootstrap.install()\n' + code
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=here, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run an exported notebook script headless.')
+    parser.add_argument('script', nargs='?')
+    parser.add_argument('--figures', help='directory to save the open figures to at the end')
+    parser.add_argument('--import-time', action='store_true',
+                        help='compare the start-up of the plotting imports with and without the bootstrap')
+    args = parser.parse_args()
+    if args.import_time:
+        before = import_time()
+        after = import_time(bootstrap=True)
+        print('plain imports:        {:.3f}s'.format(before))
+        print('bootstrapped imports: {:.3f}s'.format(after))
+    if args.script:
+        run_script(args.script, args.figures)
+    elif not args.import_time:
+        parser.error('give a script to run or --import-time')
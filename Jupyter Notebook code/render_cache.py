@@ -0,0 +1,281 @@
+"""Content-addressed cache of rendered figures for the notebook exports.
+
+`gender_gap.py` and `collage_analysis.py` draw every figure again on each
+run, even when neither the CSV nor the plotting code changed. `RenderCache`
+names each rendered file after a SHA-256 of everything that decides what
+it looks like:
+
+* the data slice that is plotted, hashed with `pd.util.hash_pandas_object`
+  for DataFrames and Series and from the raw bytes for NumPy arrays,
+* the plot parameters and the output format and resolution,
+* the source code of the drawing function, and the values of the module
+  globals it reads, such as `cb_dark_blue` in `gender_gap.py`, following
+  the functions it calls in turn,
+* the Python, NumPy, pandas and matplotlib versions.
+
+On a hit the cached PNG or SVG is returned without matplotlib being
+imported or called. On a miss the figure is drawn, saved and closed. The
+directory is kept under `max_bytes` by deleting the least recently used
+files.
+
+    cache = RenderCache()
+
+    @cache.wrap
+    def stem_figure(women_degrees, cats, color):
+        fig = plt.figure(figsize=(18, 3))
+        ...
+        return fig
+
+    path = stem_figure(women_degrees[['Year'] + stem_cats], cats=stem_cats, color=cb_dark_blue)
+
+The exports in the sub-folders can import this module when they are run
+with `notebook_bootstrap.py`, which puts this folder on `sys.path`.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import platform
+import tempfile
+import threading
+import types
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = '.render_cache'
+MAX_BYTES = 256 * 2 ** 20
+FORMATS = ('png', 'svg')
+LIBRARIES = ('numpy', 'pandas', 'matplotlib')
+
+
+def library_versions(libraries=LIBRARIES):
+    """Installed versions of `libraries` and of Python, without importing them."""
+    versions = {'python': platform.python_version()}
+    for name in libraries:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def update_data_hash(digest, data):
+    """Feed the content of `data` into a hashlib object.
+
+    DataFrames, Series, NumPy arrays, and dicts, lists and tuples of them
+    are hashed by content. Anything else is pickled.
+    """
+    if isinstance(data, pd.DataFrame):
+        digest.update(b'DataFrame')
+        digest.update(repr([(str(name), str(dtype)) for name, dtype in data.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, pd.Series):
+        digest.update(b'Series')
+        digest.update(repr((str(data.name), str(data.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif isinstance(data, np.ndarray) and data.dtype != object:
+        digest.update(repr((data.dtype.str, data.shape)).encode())
+        digest.update(np.ascontiguousarray(data).tobytes())
+    elif isinstance(data, dict):
+        digest.update(b'dict')
+        for key in sorted(data, key=repr):
+            digest.update(repr(key).encode())
+            update_data_hash(digest, data[key])
+    elif isinstance(data, (list, tuple)):
+        digest.update(type(data).__name__.encode())
+        for item in data:
+            update_data_hash(digest, item)
+    else:
+        digest.update(pickle.dumps(data, protocol=4))
+
+
+def function_source(func):
+    """The source of `func`, or its qualified name if the source is unavailable."""
+    func = inspect.unwrap(func)
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return '{}.{}'.format(func.__module__, func.__qualname__)
+
+
+def code_names(code):
+    """Global names read by a code object and the functions nested in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+
+def update_code_hash(digest, func, seen=None):
+    """Feed the source of `func` and the globals it reads into a hashlib object.
+
+    Functions among those globals, and in the closure of `func`, are
+    followed in turn. Modules are left out, their code is covered by the
+    library versions. Other values are hashed like data, or by `repr` if
+    they cannot be pickled.
+    """
+    seen = set() if seen is None else seen
+    func = inspect.unwrap(func)
+    if id(func) in seen:
+        return
+    seen.add(id(func))
+    digest.update(function_source(func).encode())
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return
+    values = [(name, func.__globals__[name]) for name in sorted(code_names(code))
+              if name in func.__globals__]
+    values += [(name, cell.cell_contents) for name, cell in zip(code.co_freevars, func.__closure__ or ())]
+    for name, value in values:
+        digest.update(name.encode())
+        if isinstance(value, types.ModuleType):
+            continue
+        if isinstance(value, types.FunctionType):
+            update_code_hash(digest, value, seen)
+            continue
+        try:
+            update_data_hash(digest, value)
+        except Exception:
+            digest.update(repr(value).encode())
+
+
+class RenderCache:
+    """Directory of rendered figures named after the hash of their inputs.
+
+    Args:
+        directory (str): Where the files are kept.
+        max_bytes (int): Size of the directory above which the least
+            recently used files are deleted.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.versions = library_versions()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def key(self, draw, data, params=None, fmt='png', dpi=None):
+        """Hex SHA-256 of the data, the parameters, the code and the versions."""
+        digest = hashlib.sha256()
+        update_data_hash(digest, data)
+        update_code_hash(digest, draw)
+        digest.update(json.dumps(
+            {'params': params or {}, 'format': fmt, 'dpi': dpi, 'versions': self.versions},
+            sort_keys=True, default=repr).encode())
+        return digest.hexdigest()
+
+    def path(self, key, fmt='png'):
+        return os.path.join(self.directory, '{}.{}'.format(key, fmt))
+
+    def render(self, draw, data, params=None, fmt='png', dpi=None):
+        """Return the file of `draw(data, **params)`, drawing it only on a miss.
+
+        Args:
+            draw (function): Takes the data and the parameters and returns
+                a matplotlib Figure.
+            data: The data slice the figure shows. Pass only the columns
+                and rows it uses, so unrelated changes still hit.
+            params (dict): Keyword arguments of `draw`, JSON-serializable or
+                with a stable `repr`.
+            fmt (str): 'png' or 'svg'.
+            dpi (int): Resolution of the saved file, matplotlib's default
+                if None.
+
+        Returns:
+            str: Path of the rendered file.
+        """
+        if fmt not in FORMATS:
+            raise ValueError('format must be one of {}, not {!r}'.format(FORMATS, fmt))
+        params = params or {}
+        path = self.path(self.key(draw, data, params, fmt, dpi), fmt)
+        with self.lock:
+            if os.path.exists(path):
+                # the modification time orders the files for eviction
+                os.utime(path)
+                self.hits += 1
+                return path
+            self.misses += 1
+
+        import matplotlib.pyplot as plt
+        fig = draw(data, **params)
+        os.makedirs(self.directory, exist_ok=True)
+        # not named `.png`/`.svg`, so `evict` never counts or deletes it
+        handle, temp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(handle)
+        try:
+            fig.savefig(temp, format=fmt, dpi=dpi or 'figure')
+            os.replace(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+        finally:
+            plt.close(fig)
+        self.evict(keep=path)
+        return path
+
+    def wrap(self, draw, fmt='png', dpi=None):
+        """Return `draw(data, **params)` that renders through the cache and returns the path."""
+        @functools.wraps(draw)
+        def cached_draw(data, **params):
+            return self.render(draw, data, params, fmt, dpi)
+        return cached_draw
+
+    def files(self):
+        """`(mtime, size, path)` of every cached file, oldest first."""
+        found = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return found
+        for name in names:
+            if name.rsplit('.', 1)[-1] not in FORMATS:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(found)
+
+    def evict(self, keep=None):
+        """Delete the least recently used files until the cache fits in `max_bytes`."""
+        with self.lock:
+            files = self.files()
+            total = sum(size for mtime, size, path in files)
+            for mtime, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def clear(self):
+        """Delete every cached file."""
+        with self.lock:
+            for mtime, size, path in self.files():
+                os.remove(path)
+
+    def stats(self):
+        """Hit, miss and eviction counters, with the number and size of the files."""
+        files = self.files()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'files': len(files),
+            'bytes': sum(size for mtime, size, path in files),
+        }